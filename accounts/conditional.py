@@ -0,0 +1,32 @@
+import hashlib
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """
+    Builds a strong ETag from the version data a response depends on.
+    """
+    value = "|".join(str(part) for part in parts)
+    return quote_etag(
+        hashlib.md5(value.encode("utf-8"), usedforsecurity=False).hexdigest()
+    )
+
+
+def conditional_get(request, build, etag=None, last_modified=None):
+    """
+    Answers with 304 Not Modified when the request's If-None-Match/If-Modified-Since
+    validators still match, without calling build(). Otherwise returns build(). Both
+    carry the ETag, Last-Modified and Vary headers.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+    # Validators depend on the negotiated renderer, so shared caches must key on Accept.
+    patch_vary_headers(response, ["Accept"])
+    if etag:
+        response["ETag"] = etag
+    if timestamp is not None:
+        response["Last-Modified"] = http_date(timestamp)
+    return response
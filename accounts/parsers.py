@@ -0,0 +1,21 @@
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from .renderers import msgpack_ext_hook
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies sent with Content-Type: application/msgpack.
+    """
+
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(
+                stream.read(), ext_hook=msgpack_ext_hook, timestamp=3
+            )
+        # A malformed decimal extension fails with decimal.InvalidOperation.
+        except (ValueError, ArithmeticError) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
@@ -1,14 +1,95 @@
-from rest_framework import renderers
 import json
+from decimal import Decimal
+import msgpack
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+# MessagePack extension type carrying a Decimal as its exact string form.
+DECIMAL_EXT_TYPE = 1
+
+
+def encode_default(obj):
+    """
+    Encodes values the JSON encoder does not handle itself. Decimals keep their exact
+    string form, as the serializers render them.
+    """
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            default=encode_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
+    return json.dumps(
+        data, default=encode_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def msgpack_default(obj):
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(DECIMAL_EXT_TYPE, str(obj).encode("ascii"))
+    return _encoder.default(obj)
+
+
+def msgpack_ext_hook(code, data):
+    if code == DECIMAL_EXT_TYPE:
+        return Decimal(data.decode("ascii"))
+    return msgpack.ExtType(code, data)
+
+
+def error_envelope(data, renderer_context):
+    """
+    Wraps the body of responses built by the exception handler in {"errors": ...}.
+    """
+    response = (renderer_context or {}).get("response")
+    if response is not None and response.exception:
+        return {"errors": data}
+    return data
 
 
 class ErrorRenderer(renderers.JSONRenderer):
+    """
+    Renders JSON with orjson when it is installed. Responses built by the exception
+    handler are wrapped in an {"errors": ...} envelope.
+    """
+
     charset = "utf-8"
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
-        response = ""
-        if "ErrorDetail" in str(data):
-            response = json.dumps({"errors": data})
-        else:
-            response = json.dumps(data)
-        return response
+        if data is None:
+            return b""
+        return dumps(error_envelope(data, renderer_context))
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Renders MessagePack for clients sending Accept: application/msgpack. Decimals travel
+    as an extension type and datetimes as MessagePack timestamps, so neither loses
+    precision.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(
+            error_envelope(data, renderer_context),
+            default=msgpack_default,
+            datetime=True,
+        )
@@ -64,6 +64,7 @@ INSTALLED_APPS = [
     "products",
     "cart",
     "bills",
+    "notifications",
 ]
 
 MIDDLEWARE = [
@@ -147,6 +148,28 @@ STORAGES = {
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
+    "invoices": {
+        "BACKEND": env.str(
+            "INVOICE_STORAGE_BACKEND",
+            default="django.core.files.storage.FileSystemStorage",
+        ),
+        "OPTIONS": {
+            "location": env.str(
+                "INVOICE_STORAGE_ROOT", default=str(BASE_DIR / "invoices")
+            ),
+        },
+    },
+    "reports": {
+        "BACKEND": env.str(
+            "REPORT_STORAGE_BACKEND",
+            default="django.core.files.storage.FileSystemStorage",
+        ),
+        "OPTIONS": {
+            "location": env.str(
+                "REPORT_STORAGE_ROOT", default=str(BASE_DIR / "reports")
+            ),
+        },
+    },
 }
 
 # Default primary key field type
@@ -177,12 +200,65 @@ REST_FRAMEWORK = {
 # Set custom auth model
 AUTH_USER_MODEL = "accounts.User"
 
+# Cache Settings
+# "redis" shares the cache between processes through REDIS_URL (or CACHE_URL),
+# "locmem" keeps a per-process stand-in for development.
+CACHE_BACKEND = env.str("CACHE_BACKEND", default="redis")
+if CACHE_BACKEND == "locmem":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "checkoutmate",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": env.str("CACHE_URL", default=env("REDIS_URL")),
+        },
+    }
+
+# Product catalog responses are cached for this many seconds per catalog version
+PRODUCT_CACHE_TIMEOUT = env.int("PRODUCT_CACHE_TIMEOUT", default=300)
+# How long a cache miss may hold its rebuild lock (and others wait for it)
+PRODUCT_CACHE_LOCK_TIMEOUT = 5
+# Deleted products stay in the change feed for this many days; older cursors must resync
+PRODUCT_TOMBSTONE_RETENTION_DAYS = env.int(
+    "PRODUCT_TOMBSTONE_RETENTION_DAYS", default=30
+)
+# Products kept by each process's SKU/id lookup cache
+PRODUCT_LOOKUP_CACHE_SIZE = env.int("PRODUCT_LOOKUP_CACHE_SIZE", default=10000)
+# The daily inventory report only lists products changed since the previous report
+DAILY_PRODUCT_REPORT_CHANGED_ONLY = env.bool(
+    "DAILY_PRODUCT_REPORT_CHANGED_ONLY", default=False
+)
+# Stored inventory report files are deleted after this many days
+REPORT_RETENTION_DAYS = env.int("REPORT_RETENTION_DAYS", default=30)
+# Products falling below their low stock threshold within this many seconds share one alert
+LOW_STOCK_ALERT_DEBOUNCE = env.int("LOW_STOCK_ALERT_DEBOUNCE", default=300)
+
 # Celery Settings
 CELERY_TIMEZONE = "UTC"
-CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_BROKER_URL = env("REDIS_URL")
 CELERY_RESULT_BACKEND = env("REDIS_URL")
+# Every task is fire-and-forget: nothing waits on results or on the STARTED state.
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_TRACK_STARTED = False
+# Workers reserve one task at a time so a long report or render never holds back
+# queued work another process could pick up. See the worker profiles in the readme.
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# CPU-bound invoice rendering, I/O-bound email delivery and scheduled jobs run on
+# separate queues (and workers), so a slow daily report never delays invoices.
+CELERY_TASK_DEFAULT_QUEUE = "default"
+CELERY_TASK_ROUTES = {
+    "bills.tasks.render_bill_pdf": {"queue": "pdf"},
+    "notifications.tasks.dispatch_outbound_emails": {"queue": "email"},
+    "notifications.tasks.prune_outbound_emails": {"queue": "periodic"},
+    "products.tasks.*": {"queue": "periodic"},
+}
 
 # Celery Beat Schedule
 CELERY_BEAT_SCHEDULE = {
@@ -194,10 +270,38 @@ CELERY_BEAT_SCHEDULE = {
         "task": "products.tasks.send_daily_product_update",
         "schedule": crontab(hour=7, minute=0),  # Run daily at 7 AM
     },
+    "prune-inventory-reports": {
+        "task": "products.tasks.prune_inventory_reports",
+        "schedule": crontab(hour=3, minute=15),  # Run daily at 3:15 AM
+    },
+    "prune-product-tombstones": {
+        "task": "products.tasks.prune_product_tombstones",
+        "schedule": crontab(hour=3, minute=0),  # Run daily at 3 AM
+    },
+    "dispatch-outbound-emails": {
+        "task": "notifications.tasks.dispatch_outbound_emails",
+        "schedule": crontab(minute="*"),  # Run every minute to pick up retries
+    },
+    "prune-outbound-emails": {
+        "task": "notifications.tasks.prune_outbound_emails",
+        "schedule": crontab(hour=3, minute=30),  # Run daily at 3:30 AM
+    },
 }
 
+# Invoice rendering engine: "xhtml2pdf" renders bills/bill_pdf.html,
+# "reportlab" lays out the standard invoice directly.
+BILL_PDF_ENGINE = env.str("BILL_PDF_ENGINE", default="xhtml2pdf")
+# Load the engine when a worker process starts; set on workers consuming the pdf queue
+WARM_UP_INVOICE_RENDERER = env.bool("WARM_UP_INVOICE_RENDERER", default=False)
+
 # Email settings
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Use django.core.mail.backends.filebased.EmailBackend with EMAIL_FILE_PATH (or the
+# console/locmem backends) to develop without sending real mail.
+EMAIL_BACKEND = env.str(
+    "EMAIL_BACKEND", default="django.core.mail.backends.smtp.EmailBackend"
+)
+EMAIL_FILE_PATH = env.str("EMAIL_FILE_PATH", default=str(BASE_DIR / "sent_emails"))
+EMAIL_TIMEOUT = env.int("EMAIL_TIMEOUT", default=30)
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -205,6 +309,8 @@ EMAIL_USE_SSL = False
 EMAIL_HOST_USER = "shivam.gupta02210@gmail.com"
 EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = "shivam.gupta02210@gmail.com"
+# Sent emails are kept in the outbox for this many days
+OUTBOX_RETENTION_DAYS = env.int("OUTBOX_RETENTION_DAYS", default=7)
 
 # drf-spectacular Settings
 SPECTACULAR_SETTINGS = {
@@ -10,10 +10,17 @@ class BillItemInline(admin.TabularInline):
 
 @admin.register(Bill)
 class BillAdmin(admin.ModelAdmin):
-    list_display = ["id", "user", "total_amount", "item_count", "created_at"]
-    list_filter = ["created_at"]
+    list_display = [
+        "id",
+        "user",
+        "total_amount",
+        "item_count",
+        "invoice_status",
+        "created_at",
+    ]
+    list_filter = ["invoice_status", "created_at"]
     search_fields = ["user__email", "user__name"]
-    readonly_fields = ["user", "total_amount", "created_at"]
+    readonly_fields = ["user", "total_amount", "invoice_status", "created_at"]
     inlines = [BillItemInline]
 
     def item_count(self, obj):
@@ -0,0 +1,87 @@
+import re
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+
+PAGE_PATTERN = re.compile(rb"/Type\s*/Page\b")
+
+
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_case(engine, lines, repeat):
+    """
+    Renders one invoice size through one engine inside a fresh process.
+    """
+    import django
+
+    django.setup()
+    from bills.pdf import render_invoice, sample_invoice
+
+    bill, items = sample_invoice(lines)
+    pdf = render_invoice(bill, items, engine=engine)
+    pages = len(PAGE_PATTERN.findall(pdf))
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render_invoice(bill, items, engine=engine)
+    elapsed = (time.perf_counter() - started) / repeat
+
+    # Allocation tracing slows rendering down, so it gets a separate untimed render.
+    tracemalloc.start()
+    render_invoice(bill, items, engine=engine)
+    peak_allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "engine": engine,
+        "lines": lines,
+        "pages": pages,
+        "seconds": elapsed,
+        "peak_rss_kb": peak_rss_kb(),
+        "peak_allocated_kb": peak_allocated // 1024,
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the invoice rendering engines on invoices of different sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--engines",
+            nargs="+",
+            default=["xhtml2pdf", "reportlab"],
+            choices=["xhtml2pdf", "reportlab"],
+        )
+        parser.add_argument("--lines", nargs="+", type=int, default=[1, 10, 100])
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Timed renders per case."
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'engine':<10} {'lines':>6} {'pages':>6} {'ms/invoice':>11} "
+            f"{'ms/page':>9} {'peak RSS MB':>12} {'peak alloc MB':>14}"
+        )
+        # Each case runs in its own spawned process so peak RSS is not shared between engines.
+        context = get_context("spawn")
+        for engine in options["engines"]:
+            for lines in options["lines"]:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(
+                        run_case, engine, lines, options["repeat"]
+                    ).result()
+                milliseconds = result["seconds"] * 1000
+                self.stdout.write(
+                    f"{result['engine']:<10} {result['lines']:>6} {result['pages']:>6} "
+                    f"{milliseconds:>11.1f} {milliseconds / result['pages']:>9.1f} "
+                    f"{result['peak_rss_kb'] / 1024:>12.1f} "
+                    f"{result['peak_allocated_kb'] / 1024:>14.1f}"
+                )
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bills", "0004_alter_billitem_bill"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bill",
+            name="invoice_status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("READY", "Ready"),
+                    ("FAILED", "Failed"),
+                ],
+                default="PENDING",
+                max_length=10,
+            ),
+        ),
+    ]
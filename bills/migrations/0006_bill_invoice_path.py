@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bills", "0005_bill_invoice_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bill",
+            name="invoice_path",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
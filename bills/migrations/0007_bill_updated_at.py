@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bills", "0006_bill_invoice_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bill",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
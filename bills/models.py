@@ -4,9 +4,19 @@ from products.models import Product
 
 
 class Bill(models.Model):
+    class InvoiceStatus(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        READY = "READY", "Ready"
+        FAILED = "FAILED", "Failed"
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    invoice_status = models.CharField(
+        max_length=10, choices=InvoiceStatus.choices, default=InvoiceStatus.PENDING
+    )
+    invoice_path = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
 
 class BillItem(models.Model):
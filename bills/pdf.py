@@ -0,0 +1,154 @@
+from decimal import Decimal
+from io import BytesIO
+from xml.sax.saxutils import escape
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from xhtml2pdf import pisa
+
+INVOICE_TEMPLATE = "bills/bill_pdf.html"
+
+# Styles for the ReportLab engine are built once per process and shared by every render.
+_SAMPLE_STYLES = getSampleStyleSheet()
+HEADING_STYLE = ParagraphStyle(
+    "InvoiceHeading",
+    parent=_SAMPLE_STYLES["Title"],
+    textColor=colors.HexColor("#3498db"),
+    fontSize=28,
+    leading=34,
+)
+INFO_STYLE = ParagraphStyle("InvoiceInfo", parent=_SAMPLE_STYLES["Normal"], leading=16)
+FOOTER_STYLE = ParagraphStyle(
+    "InvoiceFooter",
+    parent=_SAMPLE_STYLES["Normal"],
+    alignment=TA_CENTER,
+    textColor=colors.HexColor("#777777"),
+)
+TABLE_STYLE = TableStyle(
+    [
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#f2f2f2")),
+        ("LINEBELOW", (0, 0), (-1, -2), 0.5, colors.HexColor("#dddddd")),
+        ("LINEABOVE", (0, -1), (-1, -1), 1.5, colors.HexColor("#333333")),
+        ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
+        ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#f8f8f8")),
+        ("SPAN", (0, -1), (2, -1)),
+        ("TOPPADDING", (0, 0), (-1, -1), 6),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+    ]
+)
+COLUMN_WIDTHS = [85 * mm, 25 * mm, 30 * mm, 30 * mm]
+
+
+def render_pdf(template_src, context_dict):
+    """
+    Generates a PDF from the given template and context.
+    """
+    template = get_template(template_src)
+    html = template.render(context_dict)
+    result = BytesIO()
+    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
+    if not pdf.err:
+        return result.getvalue()
+    return None
+
+
+def render_invoice_xhtml2pdf(bill, items):
+    context = {
+        "bill": bill,
+        "user": bill.user,
+        "items": items,
+    }
+    return render_pdf(INVOICE_TEMPLATE, context)
+
+
+def render_invoice_reportlab(bill, items):
+    """
+    Lays out the standard invoice directly with ReportLab, skipping HTML and CSS parsing.
+    """
+    rows = [["Product", "Quantity", "Price", "Total"]]
+    for item in items:
+        rows.append(
+            [
+                item.product.name,
+                item.quantity,
+                f"${item.price:.2f}",
+                f"${item.price * item.quantity:.2f}",
+            ]
+        )
+    rows.append(["Total Amount", "", "", f"${bill.total_amount:.2f}"])
+
+    table = Table(rows, colWidths=COLUMN_WIDTHS, repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    story = [
+        Paragraph("Invoice", HEADING_STYLE),
+        Spacer(1, 8 * mm),
+        Paragraph(f"<b>Customer:</b> {escape(bill.user.name)}", INFO_STYLE),
+        Paragraph(f"<b>Invoice Number:</b> #{bill.id}", INFO_STYLE),
+        Paragraph(
+            f"<b>Date:</b> {timezone.localtime(bill.created_at):%B %d, %Y}",
+            INFO_STYLE,
+        ),
+        Spacer(1, 8 * mm),
+        table,
+        Spacer(1, 8 * mm),
+        Paragraph("Thank you for your business!", FOOTER_STYLE),
+    ]
+
+    result = BytesIO()
+    document = SimpleDocTemplate(
+        result, pagesize=A4, title=f"Invoice - {bill.id}", author="CheckoutMate"
+    )
+    document.build(story)
+    return result.getvalue()
+
+
+ENGINES = {
+    "xhtml2pdf": render_invoice_xhtml2pdf,
+    "reportlab": render_invoice_reportlab,
+}
+
+
+def render_invoice(bill, items, engine=None):
+    """
+    Renders the invoice of a bill with the engine selected by BILL_PDF_ENGINE.
+    """
+    return ENGINES[engine or settings.BILL_PDF_ENGINE](bill, list(items))
+
+
+def sample_invoice(lines):
+    """
+    Builds an unsaved bill with the given number of lines, used to warm up and benchmark engines.
+    """
+    from accounts.models import User
+    from products.models import Product
+    from .models import Bill, BillItem
+
+    user = User(name="Sample Customer", email="customer@checkoutmate.com")
+    bill = Bill(id=1, user=user, total_amount=Decimal("0.00"))
+    bill.created_at = timezone.now()
+    items = [
+        BillItem(
+            bill=bill,
+            product=Product(name=f"Sample Product {index}"),
+            quantity=index % 5 + 1,
+            price=Decimal("19.99"),
+        )
+        for index in range(1, lines + 1)
+    ]
+    bill.total_amount = sum(item.price * item.quantity for item in items)
+    return bill, items
+
+
+def warm_up(engine=None):
+    """
+    Renders a throwaway invoice so imports, fonts and the compiled template are loaded up front.
+    """
+    bill, items = sample_invoice(1)
+    render_invoice(bill, items, engine=engine)
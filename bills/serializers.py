@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Bill, BillItem
-from products.serializers import ProductSerializer
+from products.serializers import ProductSerializer, ProductSummarySerializer
 
 
 class BillItemSerializer(serializers.ModelSerializer):
@@ -11,10 +11,25 @@ class BillItemSerializer(serializers.ModelSerializer):
         fields = ["id", "product", "quantity", "price"]
 
 
+class CompactBillItemSerializer(BillItemSerializer):
+    product = ProductSummarySerializer(read_only=True)
+
+
 class BillSerializer(serializers.ModelSerializer):
-    items = BillItemSerializer(many=True, read_only=True)
+    items = BillItemSerializer(source="bills", many=True, read_only=True)
+
+    class Meta:
+        model = Bill
+        fields = ["id", "user", "total_amount", "invoice_status", "items", "created_at"]
+        read_only_fields = ["user", "total_amount", "invoice_status", "created_at"]
+
+
+class CompactBillSerializer(BillSerializer):
+    items = CompactBillItemSerializer(source="bills", many=True, read_only=True)
+
 
+class BillInvoiceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Bill
-        fields = ["id", "user", "total_amount", "items", "created_at"]
-        read_only_fields = ["user", "total_amount", "created_at"]
+        fields = ["id", "invoice_status"]
+        read_only_fields = ["invoice_status"]
@@ -0,0 +1,21 @@
+import hashlib
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+
+
+def get_invoice_storage():
+    return storages["invoices"]
+
+
+def save_invoice(bill_id, pdf_content):
+    """
+    Stores a rendered invoice keyed by bill id and content hash and returns its name.
+    An invoice that is already stored is reused instead of being written again.
+    """
+    digest = hashlib.sha256(pdf_content).hexdigest()[:16]
+    name = f"bills/{bill_id}/{digest}.pdf"
+    storage = get_invoice_storage()
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(pdf_content))
+    return name
+
@@ -1,15 +1,77 @@
-from django.core.mail import EmailMessage
+import logging
+
 from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
 from celery import shared_task
+from celery.signals import worker_process_init
+from .models import Bill, BillItem
+from .pdf import render_invoice, warm_up
+from .storage import save_invoice
+from notifications.outbox import queue_email, stored_attachment
+
+logger = logging.getLogger(__name__)
+
+
+@worker_process_init.connect
+def warm_up_invoice_renderer(**kwargs):
+    """
+    Loads the invoice engine in every pool process of a pdf worker before it picks up
+    its first render. Other workers never render, so they skip it.
+    """
+    if not settings.WARM_UP_INVOICE_RENDERER:
+        return
+    try:
+        warm_up()
+    except Exception:
+        logger.exception("Failed to warm up the invoice renderer")
 
 
 @shared_task
-def send_bill_email(bill_id, user_email, pdf_content):
-    email = EmailMessage(
+def render_bill_pdf(bill_id):
+    """
+    Renders the invoice of a committed bill and emails it to the customer.
+    """
+    bill = (
+        Bill.objects.select_related("user")
+        .prefetch_related(
+            Prefetch("bills", queryset=BillItem.objects.select_related("product"))
+        )
+        .get(pk=bill_id)
+    )
+    try:
+        pdf = render_invoice(bill, bill.bills.all())
+    except Exception:
+        logger.exception("Failed to render invoice for bill %s", bill_id)
+        pdf = None
+
+    if not pdf:
+        Bill.objects.filter(pk=bill_id).update(
+            invoice_status=Bill.InvoiceStatus.FAILED, updated_at=timezone.now()
+        )
+        return
+
+    invoice_path = save_invoice(bill.id, pdf)
+    Bill.objects.filter(pk=bill_id).update(
+        invoice_status=Bill.InvoiceStatus.READY,
+        invoice_path=invoice_path,
+        updated_at=timezone.now(),
+    )
+    queue_bill_email(bill.id, bill.user.email, invoice_path)
+
+
+def queue_bill_email(bill_id, user_email, invoice_path):
+    """
+    Queues the invoice email in the outbox. The stored invoice is only read when the
+    email is sent.
+    """
+    queue_email(
         subject=f"Bill for Order {bill_id}",
         body="Please find attached the bill for your recent order.",
-        from_email=settings.DEFAULT_FROM_EMAIL,
         to=[user_email],
+        attachments=[
+            stored_attachment(
+                "invoices", invoice_path, f"bill_{bill_id}.pdf", "application/pdf"
+            )
+        ],
     )
-    email.attach(f"bill_{bill_id}.pdf", pdf_content, "application/pdf")
-    email.send()
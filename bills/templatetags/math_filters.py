@@ -1,3 +1,4 @@
+from decimal import Decimal
 from django import template
 
 register = template.Library()
@@ -5,7 +6,9 @@ register = template.Library()
 
 @register.filter
 def multiply(value, arg):
+    if isinstance(value, (int, Decimal)) and isinstance(arg, (int, Decimal)):
+        return value * arg
     try:
-        return float(value) * float(arg)
-    except (ValueError, TypeError):
+        return Decimal(str(value)) * Decimal(str(arg))
+    except (ArithmeticError, ValueError):
         return None
@@ -1,3 +1,258 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
+from rest_framework import status
+
+from accounts.models import User
+from bills.models import Bill, BillItem
+from bills.pdf import render_invoice, sample_invoice
+from bills.storage import get_invoice_storage, save_invoice
+from bills.tasks import queue_bill_email, render_bill_pdf, warm_up_invoice_renderer
+from bills.templatetags.math_filters import multiply
+from bills.views import BillViewSet
+from cart.models import CartItem
+from notifications.models import OutboundEmail
+from notifications.tasks import dispatch_outbound_emails
+from products.models import Product
+
+
+IN_MEMORY_STORAGES = {
+    **settings.STORAGES,
+    "invoices": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+}
+
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES, CACHES=LOCMEM_CACHES)
+class BillAPITestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.product = Product.objects.create(
+            name="Product", description="Description", price=100, quantity=20
+        )
+        self.customer = User.objects.create_user(
+            name="customer",
+            password="customerpassword",
+            email="customer@gmail.com",
+            role="CUSTOMER",
+            age=28,
+        )
+        CartItem.objects.create(
+            cart=self.customer.cart, product=self.product, quantity=2
+        )
+
+    def generate_bill(self):
+        view = BillViewSet.as_view({"post": "generate_bill"})
+        request = self.factory.post(reverse("bill-generate-bill"))
+        force_authenticate(request, user=self.customer)
+        return view(request)
+
+    def test_generate_bill_defers_invoice_rendering(self):
+        """The bill is returned before its invoice is rendered"""
+        with mock.patch("bills.views.render_bill_pdf.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.generate_bill()
+                delay.assert_not_called()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["invoice_status"], Bill.InvoiceStatus.PENDING)
+        delay.assert_called_once_with(response.data["id"])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 18)
+        self.assertEqual(self.customer.cart.items.count(), 0)
+
+    def test_generate_bill_lines(self):
+        with mock.patch("bills.views.render_bill_pdf.delay"):
+            response = self.generate_bill()
+        item = response.data["items"][0]
+        self.assertEqual(item["quantity"], 2)
+        self.assertEqual(item["product"]["description"], "Description")
+
+    def test_generate_bill_compact_lines(self):
+        view = BillViewSet.as_view({"post": "generate_bill"})
+        request = self.factory.post(reverse("bill-generate-bill") + "?compact=true")
+        force_authenticate(request, user=self.customer)
+        with mock.patch("bills.views.render_bill_pdf.delay"):
+            response = view(request)
+        self.assertEqual(
+            response.data["items"][0]["product"],
+            {"id": self.product.pk, "name": "Product", "price": "100.00"},
+        )
+
+    def test_generate_bill_with_insufficient_stock(self):
+        """A checkout that cannot reserve stock leaves no bill behind"""
+        Product.objects.filter(pk=self.product.pk).update(quantity=1)
+        with mock.patch("bills.views.render_bill_pdf.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.generate_bill()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Bill.objects.count(), 0)
+        self.assertEqual(self.customer.cart.items.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 1)
+        delay.assert_not_called()
+
+    def test_generate_bill_with_empty_cart(self):
+        self.customer.cart.items.all().delete()
+        response = self.generate_bill()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_render_bill_pdf_marks_invoice_ready(self):
+        bill = Bill.objects.create(user=self.customer, total_amount=200)
+        BillItem.objects.create(bill=bill, product=self.product, quantity=2, price=100)
+
+        render_bill_pdf(bill.id)
+
+        bill.refresh_from_db()
+        self.assertEqual(bill.invoice_status, Bill.InvoiceStatus.READY)
+        self.assertTrue(get_invoice_storage().exists(bill.invoice_path))
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, [self.customer.email])
+        self.assertEqual(email.attachments[0]["name"], bill.invoice_path)
+
+    @override_settings(BILL_PDF_ENGINE="reportlab")
+    def test_render_bill_pdf_with_reportlab_engine(self):
+        bill = Bill.objects.create(user=self.customer, total_amount=200)
+        BillItem.objects.create(bill=bill, product=self.product, quantity=2, price=100)
+
+        render_bill_pdf(bill.id)
+
+        bill.refresh_from_db()
+        self.assertEqual(bill.invoice_status, Bill.InvoiceStatus.READY)
+        with get_invoice_storage().open(bill.invoice_path, "rb") as invoice:
+            self.assertTrue(invoice.read().startswith(b"%PDF"))
+
+    def test_engines_render_multi_page_invoices(self):
+        bill, items = sample_invoice(100)
+        for engine in ["xhtml2pdf", "reportlab"]:
+            with self.subTest(engine=engine):
+                pdf = render_invoice(bill, items, engine=engine)
+                self.assertTrue(pdf.startswith(b"%PDF"))
+
+    def test_only_pdf_workers_warm_up_the_renderer(self):
+        with mock.patch("bills.tasks.warm_up") as warm_up:
+            with override_settings(WARM_UP_INVOICE_RENDERER=False):
+                warm_up_invoice_renderer()
+            warm_up.assert_not_called()
+            with override_settings(WARM_UP_INVOICE_RENDERER=True):
+                warm_up_invoice_renderer()
+            warm_up.assert_called_once()
+
+    def test_reportlab_escapes_customer_name(self):
+        bill, items = sample_invoice(3)
+        bill.user.name = "Tom & <Jerry"
+        pdf = render_invoice(bill, items, engine="reportlab")
+        self.assertTrue(pdf.startswith(b"%PDF"))
+
+    def test_multiply_keeps_decimal_precision(self):
+        self.assertEqual(multiply(3, Decimal("0.10")), Decimal("0.30"))
+        self.assertEqual(multiply("2", "1.5"), Decimal("3.0"))
+        self.assertIsNone(multiply("two", 3))
+
+    def test_save_invoice_reuses_stored_file(self):
+        first = save_invoice(1, b"%PDF-1.4 invoice")
+        second = save_invoice(1, b"%PDF-1.4 invoice")
+        self.assertEqual(first, second)
+        with get_invoice_storage().open(first, "rb") as invoice:
+            self.assertEqual(invoice.read(), b"%PDF-1.4 invoice")
+
+    def test_bill_email_attaches_stored_invoice(self):
+        invoice_path = save_invoice(1, b"%PDF-1.4 invoice")
+        queue_bill_email(1, self.customer.email, invoice_path)
+        dispatch_outbound_emails()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(
+            mail.outbox[0].attachments,
+            [("bill_1.pdf", b"%PDF-1.4 invoice", "application/pdf")],
+        )
+
+    def test_render_bill_pdf_marks_invoice_failed(self):
+        bill = Bill.objects.create(user=self.customer, total_amount=200)
+
+        with mock.patch("bills.tasks.render_invoice", return_value=None):
+            render_bill_pdf(bill.id)
+
+        bill.refresh_from_db()
+        self.assertEqual(bill.invoice_status, Bill.InvoiceStatus.FAILED)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_invoice_status(self):
+        bill = Bill.objects.create(user=self.customer, total_amount=200)
+        view = BillViewSet.as_view({"get": "invoice"})
+        request = self.factory.get(reverse("bill-invoice", kwargs={"pk": bill.pk}))
+        force_authenticate(request, user=self.customer)
+        response = view(request, pk=bill.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["invoice_status"], Bill.InvoiceStatus.PENDING)
+
+    def test_download_invoice(self):
+        invoice_path = save_invoice(1, b"%PDF-1.4 invoice")
+        bill = Bill.objects.create(
+            user=self.customer,
+            total_amount=200,
+            invoice_status=Bill.InvoiceStatus.READY,
+            invoice_path=invoice_path,
+        )
+        view = BillViewSet.as_view({"get": "download_invoice"})
+        request = self.factory.get(
+            reverse("bill-download-invoice", kwargs={"pk": bill.pk})
+        )
+        force_authenticate(request, user=self.customer)
+        response = view(request, pk=bill.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.4 invoice")
+
+    def test_download_pending_invoice(self):
+        bill = Bill.objects.create(user=self.customer, total_amount=200)
+        view = BillViewSet.as_view({"get": "download_invoice"})
+        request = self.factory.get(
+            reverse("bill-download-invoice", kwargs={"pk": bill.pk})
+        )
+        force_authenticate(request, user=self.customer)
+        response = view(request, pk=bill.pk)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_bill_reads_answer_not_modified(self):
+        bill = Bill.objects.create(user=self.customer, total_amount=200)
+        BillItem.objects.create(bill=bill, product=self.product, quantity=2, price=100)
+        view = BillViewSet.as_view({"get": "retrieve"})
+        url = reverse("bill-detail", kwargs={"pk": bill.pk})
+        request = self.factory.get(url)
+        force_authenticate(request, user=self.customer)
+        response = view(request, pk=bill.pk)
+        self.assertEqual(response.data["items"][0]["quantity"], 2)
+
+        request = self.factory.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        force_authenticate(request, user=self.customer)
+        self.assertEqual(
+            view(request, pk=bill.pk).status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+        render_bill_pdf(bill.id)
+        request = self.factory.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        force_authenticate(request, user=self.customer)
+        response = view(request, pk=bill.pk)
+        self.assertEqual(response.data["invoice_status"], Bill.InvoiceStatus.READY)
+
+    def test_bill_list(self):
+        Bill.objects.create(user=self.customer, total_amount=200)
+        view = BillViewSet.as_view({"get": "list"})
+        request = self.factory.get(reverse("bill-list"))
+        force_authenticate(request, user=self.customer)
+        response = view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertIn("ETag", response)
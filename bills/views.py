@@ -1,44 +1,96 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
-from django.template.loader import get_template
-from io import BytesIO
-from .tasks import send_bill_email
-from xhtml2pdf import pisa
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from .tasks import queue_bill_email, render_bill_pdf
+from .storage import get_invoice_storage
 from django.db import transaction
+from products.cache import get_catalog_version
 from products.models import Product
+from products.signals import products_changed
 from .models import Bill, BillItem
-from .serializers import BillSerializer
+from .serializers import BillSerializer, BillInvoiceSerializer, CompactBillSerializer
 from cart.models import Cart, CartItem
-from accounts.renderers import ErrorRenderer
+from accounts.parsers import MessagePackParser
+from accounts.renderers import ErrorRenderer, MessagePackRenderer
+from accounts.conditional import conditional_get, make_etag
 from drf_spectacular.utils import extend_schema
 from cart.permissions import IsCustomer
-from django.db.models import F, Prefetch
+from products.serializers import ProductSummarySerializer, wants_compact
+from django.db.models import Count, F, Max, Prefetch
+from django.utils import timezone
 
 
 class BillViewSet(viewsets.ModelViewSet):
     serializer_class = BillSerializer
     permission_classes = [IsCustomer]
-    renderer_classes = [ErrorRenderer]
+    renderer_classes = [ErrorRenderer, MessagePackRenderer]
+    parser_classes = [JSONParser, FormParser, MultiPartParser, MessagePackParser]
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Bill.objects.none()
+        items_qs = BillItem.objects.select_related("product")
+        if wants_compact(self.request):
+            product_fields = ProductSummarySerializer.Meta.fields
+            items_qs = items_qs.only(
+                "id",
+                "bill",
+                "quantity",
+                "price",
+                *[f"product__{f}" for f in product_fields],
+            )
         return Bill.objects.prefetch_related(
-            Prefetch("bills", queryset=BillItem.objects.select_related('product'))
+            Prefetch("bills", queryset=items_qs)
         ).filter(user=self.request.user)
 
-    @extend_schema(exclude=True)
+    def get_serializer_class(self):
+        if wants_compact(self.request):
+            return CompactBillSerializer
+        return BillSerializer
+
     def list(self, request, *args, **kwargs):
-        pass
+        bills = Bill.objects.filter(user=request.user).aggregate(
+            count=Count("id"), updated_at=Max("updated_at")
+        )
+        etag = make_etag(
+            "bills",
+            bills["count"],
+            bills["updated_at"],
+            get_catalog_version(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        return conditional_get(
+            request,
+            lambda: super(BillViewSet, self).list(request, *args, **kwargs),
+            etag=etag,
+        )
 
     @extend_schema(exclude=True)
     def create(self, request, *args, **kwargs):
         pass
 
-    @extend_schema(exclude=True)
     def retrieve(self, request, *args, **kwargs):
-        pass
+        updated_at = get_object_or_404(
+            Bill.objects.values_list("updated_at", flat=True),
+            pk=kwargs["pk"],
+            user=request.user,
+        )
+        etag = make_etag(
+            "bill",
+            updated_at,
+            get_catalog_version(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        return conditional_get(
+            request,
+            lambda: super(BillViewSet, self).retrieve(request, *args, **kwargs),
+            etag=etag,
+        )
 
     @extend_schema(exclude=True)
     def update(self, request, *args, **kwargs):
@@ -52,77 +104,120 @@ class BillViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         pass
 
-    @extend_schema(exclude=True)
-    def generate_pdf(self, template_src, context_dict):
-        """
-        Generates a PDF from the given template and context.
-        """
-        template = get_template(template_src)
-        html = template.render(context_dict)
-        result = BytesIO()
-        pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
-        if not pdf.err:
-            return result.getvalue()
-        return None
-
     @action(detail=False, methods=["post"])
     @transaction.atomic
     def generate_bill(self, request):
         user = request.user
-        cart = Cart.objects.filter(user=user).prefetch_related(
-            Prefetch("items", queryset=CartItem.objects.select_related('product'))
-        ).first()
-
-        if not cart or not cart.items.exists():
+        # The cart is locked before its lines, like every other cart change.
+        Cart.objects.filter(user=user).lock()
+        # Lines are read in product order, so the stock UPDATEs below lock products in
+        # the same order in every checkout and concurrent checkouts cannot deadlock.
+        cart_items = list(
+            CartItem.objects.filter(cart__user=user)
+            .select_related("product")
+            .order_by("product_id")
+        )
+
+        if not cart_items:
             return Response(
                 {"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        cart_items = list(cart.items.all())
-        product_ids = [item.product_id for item in cart_items]
-        products = {p.id: p for p in Product.objects.filter(id__in=product_ids)}
-
-        total_amount = sum(item.product.price * item.quantity for item in cart_items)
-        bill = Bill.objects.create(user=user, total_amount=total_amount)
-
-        bill_items = []
-        products_to_update = []
-
+        # Stock is reserved with one conditional UPDATE per product, so the check
+        # and the decrement cannot be interleaved with another checkout.
+        now = timezone.now()
         for cart_item in cart_items:
-            product = products[cart_item.product_id]
-            if product.quantity < cart_item.quantity:
+            reserved = Product.objects.filter(
+                pk=cart_item.product_id, quantity__gte=cart_item.quantity
+            ).update(quantity=F("quantity") - cart_item.quantity, updated_at=now)
+            if not reserved:
                 transaction.set_rollback(True)
                 return Response(
-                    {"error": f"Not enough stock for {product.name}"},
+                    {"error": f"Not enough stock for {cart_item.product.name}"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            bill_items.append(
+        total_amount = sum(item.product.price * item.quantity for item in cart_items)
+        bill = Bill.objects.create(user=user, total_amount=total_amount)
+        BillItem.objects.bulk_create(
+            [
                 BillItem(
                     bill=bill,
-                    product=product,
+                    product=cart_item.product,
                     quantity=cart_item.quantity,
-                    price=product.price,
+                    price=cart_item.product.price,
                 )
-            )
-
-            product.quantity = F('quantity') - cart_item.quantity
-            products_to_update.append(product)
-
-        BillItem.objects.bulk_create(bill_items)
-        Product.objects.bulk_update(products_to_update, ['quantity'])
-
-        cart.items.all().delete()
-
-        context = {
-            "bill": bill,
-            "user": user,
-            "cart_items": cart_items,
-        }
-        pdf = self.generate_pdf("bills/bill_pdf.html", context)
-
-        if pdf:
-            send_bill_email.delay(bill.id, user.email, pdf)
-
-        serializer = self.get_serializer(bill)
+                for cart_item in cart_items
+            ]
+        )
+
+        CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
+        Cart.objects.filter(pk=cart_items[0].cart_id).refresh_totals()
+
+        # Stock levels changed without Product.save(), so cached catalog pages are
+        # stale and some products may have fallen below their low stock threshold.
+        products_changed.send(
+            sender=Product,
+            product_ids=[item.product_id for item in cart_items],
+            fields={"quantity", "updated_at"},
+        )
+        # The invoice is rendered and emailed by a worker once the bill is committed.
+        transaction.on_commit(lambda: render_bill_pdf.delay(bill.id))
+
+        serializer = self.get_serializer(self.get_queryset().get(pk=bill.pk))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        description="Get the rendering status of a bill's invoice",
+        responses={200: BillInvoiceSerializer},
+    )
+    @action(detail=True, methods=["get"])
+    def invoice(self, request, pk=None):
+        bill = get_object_or_404(
+            Bill.objects.only("id", "invoice_status"), pk=pk, user=request.user
+        )
+        serializer = BillInvoiceSerializer(bill)
+        return Response(serializer.data)
+
+    def get_ready_invoice(self, pk):
+        bill = get_object_or_404(
+            Bill.objects.only("id", "invoice_status", "invoice_path"),
+            pk=pk,
+            user=self.request.user,
+        )
+        if bill.invoice_status != Bill.InvoiceStatus.READY:
+            return None
+        return bill
+
+    @extend_schema(
+        description="Download the stored invoice PDF of a bill",
+        responses={(200, "application/pdf"): bytes},
+    )
+    @action(detail=True, methods=["get"], url_path="invoice/download")
+    def download_invoice(self, request, pk=None):
+        bill = self.get_ready_invoice(pk)
+        if bill is None:
+            return Response(
+                {"error": "Invoice is not ready"}, status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(
+            get_invoice_storage().open(bill.invoice_path, "rb"),
+            as_attachment=True,
+            filename=f"bill_{bill.id}.pdf",
+            content_type="application/pdf",
+        )
+
+    @extend_schema(
+        description="Email the stored invoice of a bill to the customer again",
+        request=None,
+        responses={202: None},
+    )
+    @action(detail=True, methods=["post"], url_path="invoice/resend")
+    def resend_invoice(self, request, pk=None):
+        bill = self.get_ready_invoice(pk)
+        if bill is None:
+            return Response(
+                {"error": "Invoice is not ready"}, status=status.HTTP_409_CONFLICT
+            )
+        queue_bill_email(bill.id, request.user.email, bill.invoice_path)
+        return Response(status=status.HTTP_202_ACCEPTED)
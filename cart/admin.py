@@ -9,21 +9,15 @@ class CartItemInline(admin.TabularInline):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ["user", "item_count", "total_price", "created_at", "updated_at"]
+    list_display = ["user", "item_count", "subtotal", "created_at", "updated_at"]
     list_filter = ["created_at", "updated_at"]
     search_fields = ["user__email", "user__name"]
-    readonly_fields = ["created_at", "updated_at"]
+    readonly_fields = ["item_count", "subtotal", "created_at", "updated_at"]
     inlines = [CartItemInline]
 
-    def item_count(self, obj):
-        return obj.items.count()
-
-    item_count.short_description = "Number of Items"
-
-    def total_price(self, obj):
-        return sum(item.product.price * item.quantity for item in obj.items.all())
-
-    total_price.short_description = "Total Price"
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Cart.objects.filter(pk=form.instance.pk).refresh_totals()
 
 
 @admin.register(CartItem)
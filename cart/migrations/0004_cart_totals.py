@@ -0,0 +1,49 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:33
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model("cart", "Cart")
+    CartItem = apps.get_model("cart", "CartItem")
+    money = models.DecimalField(max_digits=12, decimal_places=2)
+    lines = CartItem.objects.filter(cart=OuterRef("pk")).order_by().values("cart")
+    Cart.objects.update(
+        item_count=Coalesce(
+            Subquery(lines.annotate(count=Count("id")).values("count")), 0
+        ),
+        subtotal=Coalesce(
+            Subquery(
+                lines.annotate(
+                    total=Sum(F("quantity") * F("product__price"), output_field=money)
+                ).values("total")
+            ),
+            Value(Decimal("0.00")),
+            output_field=money,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0003_alter_cartitem_cart"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cart",
+            name="item_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="cart",
+            name="subtotal",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:41
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cart", "0004_cart_totals"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="cart",
+            name="subtotal",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.AlterField(
+            model_name="cartitem",
+            name="quantity",
+            field=models.PositiveIntegerField(
+                default=1, validators=[django.core.validators.MaxValueValidator(10000)]
+            ),
+        ),
+    ]
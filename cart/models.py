@@ -1,18 +1,225 @@
-from django.db import models
+from decimal import Decimal
+from django.db import connections, models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    F,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Least
 from django.conf import settings
+from django.core.validators import MaxValueValidator
+from django.utils import timezone
 from products.models import Product
 
+# Largest quantity a single cart line may hold. Subtotals are sized so that even
+# thousands of such lines at the highest product price fit.
+MAX_LINE_QUANTITY = 10000
+
+
+class CartQuerySet(models.QuerySet):
+    def refresh_totals(self):
+        """
+        Recomputes the denormalized item count and subtotal of the selected carts
+        from their lines in a single UPDATE.
+        """
+        money = DecimalField(max_digits=20, decimal_places=2)
+        lines = (
+            CartItem.objects.filter(cart=OuterRef("pk"))
+            .order_by()
+            .values("cart")
+        )
+        item_count = lines.annotate(count=Count("id")).values("count")
+        subtotal = lines.annotate(
+            total=Sum(F("quantity") * F("product__price"), output_field=money)
+        ).values("total")
+        return self.update(
+            item_count=Coalesce(Subquery(item_count), 0),
+            subtotal=Coalesce(
+                Subquery(subtotal), Value(Decimal("0.00")), output_field=money
+            ),
+            updated_at=timezone.now(),
+        )
+
+    def lock(self):
+        """
+        Locks the selected carts and returns their ids. Every change to cart lines takes
+        this lock before touching them, so concurrent changes to a cart queue up in the
+        same order instead of overwriting each other or deadlocking.
+        """
+        return list(self.select_for_update().values_list("id", flat=True))
+
 
 class Cart(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    item_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=20, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
+
+class CartItemManager(models.Manager):
+    def add_quantity(self, user_id, product_id, quantity):
+        """
+        Adds quantity of a product to the user's cart and returns the id of the cart item,
+        or None if the user has no cart or the product does not exist.
+        """
+        connection = connections[self.db]
+        features = connection.features
+        with transaction.atomic(using=self.db):
+            cart_ids = Cart.objects.filter(user_id=user_id).lock()
+            if not cart_ids:
+                return None
+            if (
+                features.supports_update_conflicts_with_target
+                and features.can_return_columns_from_insert
+            ):
+                cart_item_id = self._upsert_quantity(
+                    connection, cart_ids[0], product_id, quantity
+                )
+            else:
+                cart_item_id = self._add_quantity_in_transaction(
+                    cart_ids[0], product_id, quantity
+                )
+            if cart_item_id is not None:
+                Cart.objects.filter(pk=cart_ids[0]).refresh_totals()
+        return cart_item_id
+
+    def _increment_sql(self, connection, select):
+        # INSERT ... ON CONFLICT DO UPDATE adds to an existing line in the database,
+        # so no read-modify-write can lose a concurrent change. The sum is capped at
+        # MAX_LINE_QUANTITY.
+        qn = connection.ops.quote_name
+        item_table = qn(self.model._meta.db_table)
+        total = f"{item_table}.{qn('quantity')} + excluded.{qn('quantity')}"
+        return (
+            f"INSERT INTO {item_table} ({qn('cart_id')}, {qn('product_id')}, {qn('quantity')}) "
+            f"{select} "
+            f"ON CONFLICT ({qn('cart_id')}, {qn('product_id')}) "
+            f"DO UPDATE SET {qn('quantity')} = "
+            f"CASE WHEN {total} > {MAX_LINE_QUANTITY} THEN {MAX_LINE_QUANTITY} "
+            f"ELSE {total} END"
+        )
+
+    def _upsert_quantity(self, connection, cart_id, product_id, quantity):
+        # The SELECT checks the product in the same statement.
+        qn = connection.ops.quote_name
+        select = (
+            f"SELECT %s, p.{qn('id')}, %s FROM {qn(Product._meta.db_table)} p "
+            f"WHERE p.{qn('id')} = %s"
+        )
+        sql = f"{self._increment_sql(connection, select)} RETURNING {qn('id')}"
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [cart_id, quantity, product_id])
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _add_quantity_in_transaction(self, cart_id, product_id, quantity):
+        with transaction.atomic(using=self.db):
+            if not Product.objects.filter(pk=product_id).exists():
+                return None
+            cart_item, created = self.select_for_update().get_or_create(
+                cart_id=cart_id, product_id=product_id, defaults={"quantity": quantity}
+            )
+            if not created:
+                self.filter(pk=cart_item.pk).update(
+                    quantity=Least(F("quantity") + quantity, MAX_LINE_QUANTITY)
+                )
+            return cart_item.pk
+
+    def sync(self, cart_id, lines, replace=False):
+        """
+        Applies (product_id, quantity) lines to a cart in one transaction. Quantities are
+        deltas unless replace is set, in which case they are the desired cart contents.
+        Lines that end up at zero or below are removed, and lines above
+        MAX_LINE_QUANTITY are capped.
+        """
+        with transaction.atomic(using=self.db):
+            Cart.objects.filter(pk=cart_id).lock()
+            if replace:
+                self._replace_lines(cart_id, dict(lines))
+            else:
+                deltas = {}
+                for product_id, quantity in lines:
+                    deltas[product_id] = deltas.get(product_id, 0) + quantity
+                self._apply_deltas(cart_id, deltas)
+            Cart.objects.filter(pk=cart_id).refresh_totals()
+
+    def _replace_lines(self, cart_id, desired):
+        keep = [
+            self.model(
+                cart_id=cart_id,
+                product_id=product_id,
+                quantity=min(quantity, MAX_LINE_QUANTITY),
+            )
+            for product_id, quantity in desired.items()
+            if quantity > 0
+        ]
+        if keep:
+            self.bulk_create(
+                keep,
+                update_conflicts=True,
+                unique_fields=["cart", "product"],
+                update_fields=["quantity"],
+            )
+        self.filter(cart_id=cart_id).exclude(
+            product_id__in=[item.product_id for item in keep]
+        ).delete()
+
+    def _apply_deltas(self, cart_id, deltas):
+        # Deltas are added to the stored quantities by the database, never written
+        # back as absolute values read beforehand.
+        increments = [
+            (product_id, min(delta, MAX_LINE_QUANTITY))
+            for product_id, delta in deltas.items()
+            if delta > 0
+        ]
+        decrements = {
+            product_id: delta for product_id, delta in deltas.items() if delta < 0
+        }
+
+        if increments:
+            connection = connections[self.db]
+            if connection.features.supports_update_conflicts_with_target:
+                values = ", ".join(["(%s, %s, %s)"] * len(increments))
+                params = []
+                for product_id, quantity in increments:
+                    params += [cart_id, product_id, quantity]
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        self._increment_sql(connection, f"VALUES {values}"), params
+                    )
+            else:
+                for product_id, quantity in increments:
+                    self._add_quantity_in_transaction(cart_id, product_id, quantity)
+
+        if decrements:
+            change = Case(
+                *[When(product_id=pk, then=Value(d)) for pk, d in decrements.items()],
+                default=Value(0),
+            )
+            lines = self.filter(cart_id=cart_id, product_id__in=decrements)
+            lines.alias(remaining=F("quantity") + change).filter(
+                remaining__lte=0
+            ).delete()
+            lines.update(quantity=F("quantity") + change)
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, related_name="items", on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
-    quantity = models.PositiveIntegerField(default=1)
+    quantity = models.PositiveIntegerField(
+        default=1, validators=[MaxValueValidator(MAX_LINE_QUANTITY)]
+    )
+
+    objects = CartItemManager()
 
     class Meta:
         unique_together = ["cart", "product"]
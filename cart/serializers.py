@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import Cart, CartItem
-from products.serializers import ProductSerializer
+from .models import MAX_LINE_QUANTITY, Cart, CartItem
+from products.models import Product
+from products.serializers import ProductSerializer, ProductSummarySerializer
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -17,5 +18,70 @@ class CartSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Cart
-        fields = ["id", "user", "items", "created_at", "updated_at"]
-        read_only_fields = ["user", "created_at", "updated_at"]
+        fields = [
+            "id",
+            "user",
+            "items",
+            "item_count",
+            "subtotal",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = [
+            "user",
+            "item_count",
+            "subtotal",
+            "created_at",
+            "updated_at",
+        ]
+
+
+class CompactCartItemSerializer(CartItemSerializer):
+    product = ProductSummarySerializer(read_only=True)
+
+
+class CompactCartSerializer(CartSerializer):
+    items = CompactCartItemSerializer(many=True, read_only=True)
+
+
+class CartSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Cart
+        fields = ["id", "item_count", "subtotal", "updated_at"]
+        read_only_fields = fields
+
+
+class CartSyncItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(
+        min_value=-MAX_LINE_QUANTITY, max_value=MAX_LINE_QUANTITY
+    )
+
+
+class CartSyncSerializer(serializers.Serializer):
+    MODE_DELTA = "delta"
+    MODE_REPLACE = "replace"
+
+    mode = serializers.ChoiceField(
+        choices=[MODE_DELTA, MODE_REPLACE], default=MODE_DELTA
+    )
+    items = CartSyncItemSerializer(many=True, max_length=500)
+
+    def validate(self, attrs):
+        if attrs["mode"] == self.MODE_REPLACE and any(
+            item["quantity"] < 0 for item in attrs["items"]
+        ):
+            raise serializers.ValidationError(
+                {"items": "Quantities cannot be negative when replacing the cart."}
+            )
+
+        product_ids = {item["product_id"] for item in attrs["items"]}
+        found = set(
+            Product.objects.filter(id__in=product_ids).values_list("id", flat=True)
+        )
+        missing = sorted(product_ids - found)
+        if missing:
+            raise serializers.ValidationError(
+                {"items": f"Products not found: {missing}"}
+            )
+        return attrs
@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from products.models import Product
+from products.signals import products_changed
+from .models import Cart
+
+
+@receiver(pre_save, sender=Product)
+def collect_price_change(sender, instance, update_fields, **kwargs):
+    instance._price_changed = False
+    if instance._state.adding or (
+        update_fields is not None and "price" not in update_fields
+    ):
+        return
+    old_price = (
+        Product.objects.filter(pk=instance.pk).values_list("price", flat=True).first()
+    )
+    instance._price_changed = old_price is not None and old_price != instance.price
+
+
+@receiver(post_save, sender=Product)
+def refresh_cart_totals_on_price_change(sender, instance, created, **kwargs):
+    if not created and getattr(instance, "_price_changed", False):
+        Cart.objects.filter(items__product=instance).refresh_totals()
+
+
+@receiver(pre_delete, sender=Product)
+def collect_carts_of_deleted_product(sender, instance, **kwargs):
+    # Deleting the product removes cart lines, so the carts are locked first.
+    instance._cart_ids = Cart.objects.filter(items__product=instance).lock()
+
+
+@receiver(post_delete, sender=Product)
+def refresh_cart_totals_on_delete(sender, instance, **kwargs):
+    cart_ids = getattr(instance, "_cart_ids", None)
+    if cart_ids:
+        Cart.objects.filter(id__in=cart_ids).refresh_totals()
+
+
+@receiver(products_changed)
+def refresh_cart_totals_on_bulk_change(sender, product_ids, fields, **kwargs):
+    if "price" in fields:
+        Cart.objects.filter(items__product_id__in=product_ids).refresh_totals()
@@ -1,3 +1,255 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
+from rest_framework import status
+
+from accounts.models import User
+from cart.models import MAX_LINE_QUANTITY, CartItem
+from cart.views import CartViewSet
+from products.models import Product
+
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CartAPITestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.product = Product.objects.create(
+            name="Product", description="Description", price=100, quantity=20
+        )
+        self.customer = User.objects.create_user(
+            name="customer",
+            password="customerpassword",
+            email="customer@gmail.com",
+            role="CUSTOMER",
+            age=28,
+        )
+        self.cart = self.customer.cart
+
+    def add_item(self, data):
+        view = CartViewSet.as_view({"post": "add_item"})
+        request = self.factory.post(reverse("cart-add-item"), data, format="json")
+        force_authenticate(request, user=self.customer)
+        return view(request)
+
+    def test_add_item_creates_and_increments_line(self):
+        response = self.add_item({"product_id": self.product.pk, "quantity": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["quantity"], 2)
+        self.assertEqual(response.data["product"]["name"], "Product")
+
+        response = self.add_item({"product_id": self.product.pk, "quantity": 3})
+        self.assertEqual(response.data["quantity"], 5)
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 1)
+
+    def test_add_item_without_upsert_support(self):
+        with mock.patch.object(
+            connection.features, "supports_update_conflicts_with_target", False
+        ):
+            self.add_item({"product_id": self.product.pk, "quantity": 2})
+            response = self.add_item({"product_id": self.product.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["quantity"], 3)
+
+    def test_add_unknown_product(self):
+        response = self.add_item({"product_id": self.product.pk + 1})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_add_invalid_quantity(self):
+        response = self.add_item({"product_id": self.product.pk, "quantity": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.add_item({"product_id": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.add_item({"product_id": self.product.pk, "quantity": 10**12})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_line_quantities_are_capped(self):
+        self.product.price = "99999999.99"
+        self.product.save()
+        self.add_item({"product_id": self.product.pk, "quantity": MAX_LINE_QUANTITY})
+        response = self.add_item({"product_id": self.product.pk, "quantity": 5})
+        self.assertEqual(response.data["quantity"], MAX_LINE_QUANTITY)
+        response = self.sync_items(
+            {"items": [{"product_id": self.product.pk, "quantity": MAX_LINE_QUANTITY}]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["items"][0]["quantity"], MAX_LINE_QUANTITY)
+        self.assertEqual(response.data["subtotal"], "999999999900.00")
+
+    def sync_items(self, data):
+        view = CartViewSet.as_view({"post": "sync_items"})
+        request = self.factory.post(reverse("cart-sync-items"), data, format="json")
+        force_authenticate(request, user=self.customer)
+        return view(request)
+
+    def test_sync_items_applies_deltas(self):
+        other = Product.objects.create(
+            name="Other", description="Description", price=50, quantity=20
+        )
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+
+        response = self.sync_items(
+            {
+                "items": [
+                    {"product_id": self.product.pk, "quantity": 3},
+                    {"product_id": other.pk, "quantity": 1},
+                    {"product_id": other.pk, "quantity": 1},
+                ]
+            }
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        quantities = {i["product"]["id"]: i["quantity"] for i in response.data["items"]}
+        self.assertEqual(quantities, {self.product.pk: 5, other.pk: 2})
+
+        self.sync_items({"items": [{"product_id": self.product.pk, "quantity": -5}]})
+        self.assertEqual(
+            list(self.cart.items.values_list("product_id", "quantity")), [(other.pk, 2)]
+        )
+
+    def test_add_item_during_delta_sync_is_kept(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+        added = []
+
+        def add_before_sync_writes(execute, sql, params, many, context):
+            # Another request adds to the line just before the sync writes it.
+            if not added and sql.startswith('INSERT INTO "cart_cartitem"'):
+                added.append(True)
+                CartItem.objects.add_quantity(self.customer.id, self.product.pk, 4)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(add_before_sync_writes):
+            response = self.sync_items(
+                {"items": [{"product_id": self.product.pk, "quantity": 3}]}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(added)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 9)
+
+        response = self.sync_items(
+            {"items": [{"product_id": self.product.pk, "quantity": -9}]}
+        )
+        self.assertEqual(response.data["items"], [])
+
+    def test_sync_items_replaces_cart(self):
+        other = Product.objects.create(
+            name="Other", description="Description", price=50, quantity=20
+        )
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+
+        response = self.sync_items(
+            {"mode": "replace", "items": [{"product_id": other.pk, "quantity": 4}]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(self.cart.items.values_list("product_id", "quantity")), [(other.pk, 4)]
+        )
+
+    def test_sync_items_rejects_oversized_quantities(self):
+        response = self.sync_items(
+            {"items": [{"product_id": self.product.pk, "quantity": 10**12}]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_sync_items_with_unknown_product(self):
+        response = self.sync_items(
+            {"items": [{"product_id": self.product.pk + 1, "quantity": 1}]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CartItem.objects.exists())
+
+    def summary(self):
+        view = CartViewSet.as_view({"get": "summary"})
+        request = self.factory.get(reverse("cart-summary"))
+        force_authenticate(request, user=self.customer)
+        return view(request)
+
+    def test_totals_follow_cart_mutations(self):
+        self.add_item({"product_id": self.product.pk, "quantity": 2})
+        response = self.summary()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["item_count"], 1)
+        self.assertEqual(response.data["subtotal"], "200.00")
+
+        other = Product.objects.create(
+            name="Other", description="Description", price=50, quantity=20
+        )
+        self.sync_items({"items": [{"product_id": other.pk, "quantity": 3}]})
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (2, 350))
+
+        view = CartViewSet.as_view({"delete": "remove_item"})
+        url = reverse("cart-remove-item", kwargs={"product_id": other.pk})
+        request = self.factory.delete(url)
+        force_authenticate(request, user=self.customer)
+        response = view(request, product_id=other.pk)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (1, 200))
+
+    def test_totals_follow_price_changes(self):
+        self.add_item({"product_id": self.product.pk, "quantity": 2})
+        self.product.price = 150
+        self.product.save()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.subtotal, 300)
+
+        self.product.delete()
+        self.cart.refresh_from_db()
+        self.assertEqual((self.cart.item_count, self.cart.subtotal), (0, 0))
+
+    def test_saves_without_price_change_leave_carts_alone(self):
+        self.add_item({"product_id": self.product.pk, "quantity": 2})
+        with mock.patch("cart.models.CartQuerySet.refresh_totals") as refresh:
+            self.product.quantity = 5
+            self.product.save()
+            self.product.price = 100
+            self.product.save(update_fields=["price"])
+        refresh.assert_not_called()
+
+    def test_summary_reads_only_the_cart_row(self):
+        with self.assertNumQueries(1):
+            self.summary()
+
+    def test_compact_cart_lines(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+        view = CartViewSet.as_view({"get": "list"})
+        request = self.factory.get(reverse("cart-list"), {"compact": "true"})
+        force_authenticate(request, user=self.customer)
+        response = view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data[0]["items"][0]["product"],
+            {"id": self.product.pk, "name": "Product", "price": "100.00"},
+        )
+
+    def test_cart_list_answers_not_modified(self):
+        view = CartViewSet.as_view({"get": "list"})
+        request = self.factory.get(reverse("cart-list"))
+        force_authenticate(request, user=self.customer)
+        etag = view(request)["ETag"]
+
+        request = self.factory.get(reverse("cart-list"), HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.customer)
+        with self.assertNumQueries(1):
+            response = view(request)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.add_item({"product_id": self.product.pk, "quantity": 1})
+        request = self.factory.get(reverse("cart-list"), HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.customer)
+        response = view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data[0]["items"]), 1)
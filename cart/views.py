@@ -1,26 +1,79 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
-from .models import Cart, CartItem
-from .serializers import CartSerializer, CartItemSerializer
-from products.models import Product
+from .models import MAX_LINE_QUANTITY, Cart, CartItem
+from .serializers import (
+    CartSerializer,
+    CartItemSerializer,
+    CartSummarySerializer,
+    CartSyncSerializer,
+    CompactCartSerializer,
+    CompactCartItemSerializer,
+)
 from .permissions import IsCustomer
-from accounts.renderers import ErrorRenderer
+from accounts.parsers import MessagePackParser
+from accounts.renderers import ErrorRenderer, MessagePackRenderer
+from accounts.conditional import conditional_get, make_etag
 from drf_spectacular.utils import extend_schema
+from django.db import transaction
 from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from products.cache import get_catalog_version
+from products.serializers import ProductSummarySerializer, wants_compact
 
 
 class CartViewSet(viewsets.ModelViewSet):
     serializer_class = CartSerializer
     permission_classes = [IsCustomer]
-    renderer_classes = [ErrorRenderer]
+    renderer_classes = [ErrorRenderer, MessagePackRenderer]
+    parser_classes = [JSONParser, FormParser, MultiPartParser, MessagePackParser]
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False):
             return Cart.objects.none()
-        items_qs = CartItem.objects.select_related('product')
+        items_qs = self.get_items_queryset()
         return Cart.objects.prefetch_related(Prefetch("items", queryset=items_qs)).filter(user=self.request.user)
 
+    def get_items_queryset(self):
+        items_qs = CartItem.objects.select_related("product")
+        if wants_compact(self.request):
+            product_fields = ProductSummarySerializer.Meta.fields
+            items_qs = items_qs.only(
+                "id", "cart", "quantity", *[f"product__{f}" for f in product_fields]
+            )
+        return items_qs
+
+    def get_serializer_class(self):
+        if wants_compact(self.request):
+            return CompactCartSerializer
+        return CartSerializer
+
+    def get_item_serializer_class(self):
+        if wants_compact(self.request):
+            return CompactCartItemSerializer
+        return CartItemSerializer
+
+    def list(self, request, *args, **kwargs):
+        updated_at = (
+            Cart.objects.filter(user=request.user)
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        # Lines embed product data, so the catalog version is part of the validator.
+        etag = make_etag(
+            "cart",
+            updated_at,
+            get_catalog_version(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        return conditional_get(
+            request,
+            lambda: super(CartViewSet, self).list(request, *args, **kwargs),
+            etag=etag,
+        )
+
     @extend_schema(exclude=True)
     def retrieve(self, request, pk=None):
         pass
@@ -44,6 +97,18 @@ class CartViewSet(viewsets.ModelViewSet):
     def get_user_cart(self):
         return Cart.objects.get(user=self.request.user)
 
+    @extend_schema(
+        description="Get the item count and subtotal of the authenticated user's cart",
+        responses={200: CartSummarySerializer},
+    )
+    @action(detail=False, methods=["get"])
+    def summary(self, request, pk=None):
+        cart = get_object_or_404(
+            Cart.objects.only("id", "item_count", "subtotal", "updated_at"),
+            user=request.user,
+        )
+        return Response(CartSummarySerializer(cart).data)
+
     @extend_schema(
         description="Add an item to the authenticated user's cart",
         request={
@@ -51,7 +116,11 @@ class CartViewSet(viewsets.ModelViewSet):
                 "type": "object",
                 "properties": {
                     "product_id": {"type": "integer"},
-                    "quantity": {"type": "integer", "default": 1},
+                    "quantity": {
+                        "type": "integer",
+                        "default": 1,
+                        "maximum": MAX_LINE_QUANTITY,
+                    },
                 },
                 "required": ["product_id"]
             }
@@ -60,27 +129,36 @@ class CartViewSet(viewsets.ModelViewSet):
     )
     @action(detail=False, methods=["post"])
     def add_item(self, request, pk=None):
-        cart = self.get_user_cart()
-        product_id = request.data.get("product_id")
-        quantity = int(request.data.get("quantity", 1))
-
         try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+            product_id = int(request.data.get("product_id"))
+            quantity = int(request.data.get("quantity", 1))
+        except (TypeError, ValueError):
             return Response(
-                {"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND
+                {"error": "Product ID and quantity must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
-
-        if created:
-            cart_item.quantity = quantity
-        else:
-            cart_item.quantity += quantity
+        if quantity < 1:
+            return Response(
+                {"error": "Quantity must be at least 1"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if quantity > MAX_LINE_QUANTITY:
+            return Response(
+                {"error": f"Quantity cannot exceed {MAX_LINE_QUANTITY}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        cart_item.save()
+        cart_item_id = CartItem.objects.add_quantity(
+            request.user.id, product_id, quantity
+        )
+        if cart_item_id is None:
+            return Response(
+                {"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND
+            )
 
-        serializer = CartItemSerializer(cart_item)
+        cart_item = self.get_items_queryset().get(pk=cart_item_id)
+        serializer = self.get_item_serializer_class()(cart_item)
         return Response(serializer.data)
 
     @extend_schema(
@@ -90,7 +168,11 @@ class CartViewSet(viewsets.ModelViewSet):
                 "type": "object",
                 "properties": {
                     "product_id": {"type": "integer"},
-                    "quantity": {"type": "integer", "default": 1},
+                    "quantity": {
+                        "type": "integer",
+                        "default": 1,
+                        "maximum": MAX_LINE_QUANTITY,
+                    },
                 },
                 "required": ["product_id", "quantity"]
             }
@@ -102,31 +184,61 @@ class CartViewSet(viewsets.ModelViewSet):
         cart = self.get_user_cart()
         product_id = request.data.get("product_id")
         new_quantity = int(request.data.get("quantity", 1))
+        if new_quantity > MAX_LINE_QUANTITY:
+            return Response(
+                {"error": f"Quantity cannot exceed {MAX_LINE_QUANTITY}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         try:
-            cart_item = CartItem.objects.get(cart=cart, product_id=product_id)
+            cart_item = self.get_items_queryset().get(cart=cart, product_id=product_id)
         except CartItem.DoesNotExist:
             return Response(
                 {"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        if new_quantity > 0:
-            cart_item.quantity = new_quantity
-            cart_item.save()
-        else:
-            cart_item.delete()
+        with transaction.atomic():
+            Cart.objects.filter(pk=cart.pk).lock()
+            if new_quantity > 0:
+                cart_item.quantity = new_quantity
+                cart_item.save()
+            else:
+                cart_item.delete()
+            Cart.objects.filter(pk=cart.pk).refresh_totals()
 
-        serializer = CartItemSerializer(cart_item)
+        serializer = self.get_item_serializer_class()(cart_item)
         return Response(serializer.data)
 
+    @extend_schema(
+        description="Apply several item changes to the authenticated user's cart in one "
+        "request. In delta mode quantities are added to the current lines, in replace "
+        "mode the items become the whole cart. Lines at zero or below are removed.",
+        request=CartSyncSerializer,
+        responses={200: CartSerializer},
+    )
+    @action(detail=False, methods=["post"])
+    def sync_items(self, request, pk=None):
+        serializer = CartSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        lines = [(item["product_id"], item["quantity"]) for item in data["items"]]
+
+        cart = self.get_user_cart()
+        CartItem.objects.sync(
+            cart.pk, lines, replace=data["mode"] == CartSyncSerializer.MODE_REPLACE
+        )
+
+        cart = self.get_queryset().get(pk=cart.pk)
+        return Response(self.get_serializer(cart).data)
+
     @extend_schema(
         description="Remove an item from the authenticated user's cart",
         responses={204: None}
     )
     @action(detail=False, methods=["delete"], url_path="remove_item/(?P<product_id>\d+)")
-    def remove_item(self, request, pk=None):
+    def remove_item(self, request, product_id=None):
         cart = self.get_user_cart()
-        product_id = request.data.get("product_id")
 
         if not product_id:
             return Response(
@@ -140,5 +252,8 @@ class CartViewSet(viewsets.ModelViewSet):
                 {"error": "Item not found in cart"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        cart_item.delete()
+        with transaction.atomic():
+            Cart.objects.filter(pk=cart.pk).lock()
+            cart_item.delete()
+            Cart.objects.filter(pk=cart.pk).refresh_totals()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import OutboundEmail
+from .tasks import OUTBOX_DISPATCH_KEY, dispatch_outbound_emails
+
+# A scheduled dispatcher older than this is assumed lost and may be queued again.
+DISPATCH_KEY_TIMEOUT = 5 * 60
+
+
+def stored_attachment(storage, name, filename, mimetype):
+    """
+    References a file in one of settings.STORAGES to attach when the email is sent.
+    """
+    return {
+        "storage": storage,
+        "name": name,
+        "filename": filename,
+        "mimetype": mimetype,
+    }
+
+
+def queue_email(subject, body, to, attachments=(), from_email=None):
+    """
+    Adds an email to the outbox and makes sure a dispatcher runs once the current
+    transaction commits. Emails without recipients are dropped.
+    """
+    if not to:
+        return None
+    email = OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        attachments=list(attachments),
+    )
+    transaction.on_commit(schedule_dispatch)
+    return email
+
+
+def schedule_dispatch():
+    # A pending dispatcher drains everything queued meanwhile, so a burst of emails
+    # queues a single task.
+    if cache.add(OUTBOX_DISPATCH_KEY, True, timeout=DISPATCH_KEY_TIMEOUT):
+        dispatch_outbound_emails.delay()
@@ -0,0 +1,123 @@
+import logging
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import storages
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Present while a dispatcher is queued.
+OUTBOX_DISPATCH_KEY = "notifications:dispatch"
+# Emails claimed from the outbox at a time.
+OUTBOX_BATCH_SIZE = 100
+# Emails one dispatcher run sends before handing over to a fresh task.
+OUTBOX_MAX_PER_RUN = 5000
+OUTBOX_MAX_ATTEMPTS = 5
+# Delay before the first retry, doubled after every further failure.
+OUTBOX_RETRY_DELAY = timedelta(minutes=1)
+# Claimed emails are retried after this long if their dispatcher dies mid-batch.
+OUTBOX_LEASE = timedelta(minutes=10)
+
+
+@shared_task
+def dispatch_outbound_emails():
+    """
+    Sends due emails from the outbox in batches over a single mail connection.
+    """
+    # Emails queued from here on schedule the next dispatcher instead of this one.
+    cache.delete(OUTBOX_DISPATCH_KEY)
+    connection = get_connection()
+    connection.open()
+    sent = 0
+    try:
+        while sent < OUTBOX_MAX_PER_RUN:
+            batch = claim_batch()
+            if not batch:
+                return
+            deliver(batch, connection)
+            sent += len(batch)
+    finally:
+        connection.close()
+    dispatch_outbound_emails.delay()
+
+
+def claim_batch():
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.Status.QUEUED, next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:OUTBOX_BATCH_SIZE]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            next_attempt_at=now + OUTBOX_LEASE
+        )
+    return batch
+
+
+def deliver(batch, connection):
+    sent = []
+    for email in batch:
+        try:
+            build_message(email, connection).send()
+        except Exception as exc:
+            logger.warning("Failed to send email %s: %s", email.pk, exc)
+            record_failure(email, exc)
+            reopen(connection)
+        else:
+            sent.append(email.pk)
+    OutboundEmail.objects.filter(pk__in=sent).update(
+        status=OutboundEmail.Status.SENT, sent_at=timezone.now(), last_error=""
+    )
+
+
+def build_message(email, connection):
+    message = EmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        connection=connection,
+    )
+    for attachment in email.attachments:
+        storage = storages[attachment["storage"]]
+        with storage.open(attachment["name"], "rb") as content:
+            message.attach(
+                attachment["filename"], content.read(), attachment["mimetype"]
+            )
+    return message
+
+
+def record_failure(email, exc):
+    attempts = email.attempts + 1
+    values = {"attempts": attempts, "last_error": str(exc)}
+    if attempts >= OUTBOX_MAX_ATTEMPTS:
+        values["status"] = OutboundEmail.Status.FAILED
+    else:
+        values["next_attempt_at"] = timezone.now() + OUTBOX_RETRY_DELAY * 2 ** (
+            attempts - 1
+        )
+    OutboundEmail.objects.filter(pk=email.pk).update(**values)
+
+
+def reopen(connection):
+    # A failed send may have dropped the connection; the rest of the batch should
+    # still share one instead of each opening its own.
+    connection.close()
+    try:
+        connection.open()
+    except Exception:
+        logger.exception("Failed to reopen the mail connection")
+
+
+@shared_task
+def prune_outbound_emails():
+    cutoff = timezone.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    OutboundEmail.objects.filter(
+        status=OutboundEmail.Status.SENT, sent_at__lt=cutoff
+    ).delete()
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from notifications.models import OutboundEmail
+from notifications.outbox import queue_email
+from notifications.tasks import OUTBOX_MAX_ATTEMPTS, dispatch_outbound_emails
+
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+class CountingBackend(EmailBackend):
+    """
+    Locmem backend that counts opened connections and fails messages to bounce@.
+    """
+
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        if any("bounce@example.com" in message.to for message in messages):
+            raise ConnectionError("Recipient refused")
+        return super().send_messages(messages)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    EMAIL_BACKEND="notifications.tests.CountingBackend",
+)
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        CountingBackend.opened = 0
+
+    def test_queue_email_schedules_one_dispatcher(self):
+        with mock.patch("notifications.outbox.dispatch_outbound_emails.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                for number in range(3):
+                    queue_email(f"Order {number}", "Body", ["a@example.com"])
+                queue_email("Nobody", "Body", [])
+        delay.assert_called_once_with()
+        self.assertEqual(OutboundEmail.objects.count(), 3)
+
+    def test_dispatch_reuses_one_connection(self):
+        for number in range(250):
+            queue_email(f"Order {number}", "Body", ["a@example.com"])
+        dispatch_outbound_emails()
+        self.assertEqual(len(mail.outbox), 250)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertFalse(
+            OutboundEmail.objects.exclude(status=OutboundEmail.Status.SENT).exists()
+        )
+
+    def test_failed_emails_back_off_and_give_up(self):
+        queue_email("Bounced", "Body", ["bounce@example.com"])
+        queue_email("Delivered", "Body", ["a@example.com"])
+        with self.assertLogs("notifications.tasks", "WARNING"):
+            dispatch_outbound_emails()
+        self.assertEqual([message.subject for message in mail.outbox], ["Delivered"])
+
+        bounced = OutboundEmail.objects.get(subject="Bounced")
+        self.assertEqual(bounced.status, OutboundEmail.Status.QUEUED)
+        self.assertEqual(bounced.attempts, 1)
+        self.assertGreater(bounced.next_attempt_at, timezone.now())
+        self.assertIn("Recipient refused", bounced.last_error)
+
+        # Not due yet, so another run leaves it alone.
+        dispatch_outbound_emails()
+        self.assertEqual(OutboundEmail.objects.get(pk=bounced.pk).attempts, 1)
+
+        for _ in range(OUTBOX_MAX_ATTEMPTS - 1):
+            OutboundEmail.objects.filter(pk=bounced.pk).update(
+                next_attempt_at=timezone.now() - timedelta(seconds=1)
+            )
+            with self.assertLogs("notifications.tasks", "WARNING"):
+                dispatch_outbound_emails()
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.status, OutboundEmail.Status.FAILED)
+        self.assertEqual(bounced.attempts, OUTBOX_MAX_ATTEMPTS)
@@ -4,12 +4,15 @@ from .models import Product
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ["name", "price", "quantity", "created_at", "updated_at"]
+    list_display = ["name", "sku", "price", "quantity", "created_at", "updated_at"]
     list_filter = ["created_at", "updated_at"]
-    search_fields = ["name", "description"]
+    search_fields = ["name", "sku", "description"]
     readonly_fields = ("created_at", "updated_at")
     fieldsets = (
-        ("Product details", {"fields": ("name", "description", "price", "quantity")}),
+        (
+            "Product details",
+            {"fields": ("name", "sku", "description", "price", "quantity")},
+        ),
         (
             "Timestamps",
             {"fields": ("created_at", "updated_at"), "classes": ("collapse",)},
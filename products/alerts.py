@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .cache import LOW_STOCK_ALERT_KEY
+from .models import LowStockCrossing, Product
+from .tasks import send_low_stock_alert
+
+
+def record_stock_levels(product_ids):
+    """
+    Records which of the products crossed their low stock threshold, in either
+    direction, with set-based queries. New crossings schedule a low stock alert.
+    """
+    products = Product.objects.filter(pk__in=product_ids)
+    crossed = list(
+        products.filter(
+            quantity__lt=F("low_stock_threshold"), low_stock_crossing__isnull=True
+        ).values_list("id", flat=True)
+    )
+    if crossed:
+        # A concurrent write may record the same crossing first; either row will do.
+        LowStockCrossing.objects.bulk_create(
+            [LowStockCrossing(product_id=pk) for pk in crossed],
+            ignore_conflicts=True,
+        )
+        transaction.on_commit(schedule_low_stock_alert)
+    # Recovered products are re-armed, so falling low again alerts again.
+    LowStockCrossing.objects.filter(
+        product__in=products.filter(quantity__gte=F("low_stock_threshold"))
+    ).delete()
+    return crossed
+
+
+def schedule_low_stock_alert():
+    """
+    Queues one alert for the end of the debounce window unless one is already
+    pending, so crossings within the window are reported together.
+    """
+    delay = settings.LOW_STOCK_ALERT_DEBOUNCE
+    # The key outlives the countdown in case no worker picks the alert up; the alert
+    # itself clears it before reading the crossings.
+    if cache.add(LOW_STOCK_ALERT_KEY, True, timeout=delay * 2 + 60):
+        send_low_stock_alert.apply_async(countdown=delay)
@@ -0,0 +1,84 @@
+import bisect
+import threading
+from django.utils import timezone
+from .cache import get_catalog_version
+from .changes import changed_since
+from .models import Product
+
+
+class NameIndex:
+    """
+    Per-process sorted array of (casefolded name, id, name) for prefix lookups.
+    It is built once and then patched with the rows changed or deleted since its
+    watermark whenever the catalog version moves, so steady-state lookups never touch
+    the database.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.keys_by_id = {}
+        self.version = None
+        self.watermark = None
+        self.lock = threading.Lock()
+
+    def search(self, prefix, limit):
+        key = prefix.casefold()
+        with self.lock:
+            self.refresh()
+            start = bisect.bisect_left(self.items, (key,))
+            matches = []
+            for item_key, pk, name in self.items[start : start + limit]:
+                if not item_key.startswith(key):
+                    break
+                matches.append({"id": pk, "name": name})
+        return matches
+
+    def refresh(self):
+        version = get_catalog_version()
+        if version == self.version:
+            return
+        if self.watermark is None:
+            self.rebuild()
+        else:
+            self.apply_changes()
+        self.version = version
+
+    def rebuild(self):
+        # Rows saved while the index is read are re-read by the next refresh.
+        self.watermark = timezone.now()
+        rows = Product.objects.order_by().values_list("id", "name")
+        self.items = []
+        self.keys_by_id = {}
+        for pk, name in rows.iterator(chunk_size=5000):
+            key = (name.casefold(), pk, name)
+            self.items.append(key)
+            self.keys_by_id[pk] = key
+        self.items.sort()
+
+    def apply_changes(self):
+        # Only the products saved or deleted since the last refresh are touched.
+        rows, deleted, self.watermark = changed_since(self.watermark, ["id", "name"])
+        for pk, name in rows:
+            key = (name.casefold(), pk, name)
+            old = self.keys_by_id.get(pk)
+            if old != key:
+                if old is not None:
+                    self.discard(old)
+                bisect.insort(self.items, key)
+                self.keys_by_id[pk] = key
+        for pk in deleted:
+            old = self.keys_by_id.pop(pk, None)
+            if old is not None:
+                self.discard(old)
+
+    def discard(self, key):
+        index = bisect.bisect_left(self.items, key)
+        if index < len(self.items) and self.items[index] == key:
+            del self.items[index]
+
+
+name_index = NameIndex()
+
+
+def autocomplete(prefix, limit):
+    return name_index.search(prefix, limit)
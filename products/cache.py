@@ -0,0 +1,66 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = "products:catalog-version"
+# Present while a low stock alert is queued.
+LOW_STOCK_ALERT_KEY = "products:low-stock-alert"
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seeding from the clock keeps versions unique even after the cache is flushed.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidates every cached catalog response at once by moving to a new version.
+    """
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+def bump_catalog_version_on_commit():
+    # Bumping before commit would let a concurrent reader cache the old rows
+    # under the new version.
+    transaction.on_commit(bump_catalog_version)
+
+
+def cached_catalog_response(request, build):
+    """
+    Returns the response data of a catalog read from the cache, calling build() on a miss.
+    Only one process rebuilds a missing entry; the others wait briefly for its result
+    before falling back to building it themselves.
+    """
+    url = request.build_absolute_uri()
+    digest = hashlib.md5(url.encode("utf-8"), usedforsecurity=False).hexdigest()
+    key = f"products:v{get_catalog_version()}:{digest}"
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    lock_key = f"{key}:lock"
+    locked = cache.add(lock_key, 1, timeout=settings.PRODUCT_CACHE_LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + settings.PRODUCT_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = cache.get(key)
+            if data is not None:
+                return data
+
+    try:
+        data = build()
+        cache.set(key, data, settings.PRODUCT_CACHE_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return data
@@ -0,0 +1,136 @@
+import base64
+import binascii
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Product, ProductTombstone
+
+# Only changes at least this old are published, so rows saved by transactions that
+# commit a little late are never skipped by a cursor that already moved past them.
+CHANGE_FEED_LAG = timedelta(seconds=2)
+
+# Long transactions can commit rows with a timestamp slightly behind a watermark, so
+# per-process caches re-read a short window before it. Re-applying a row is harmless.
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+# Within one timestamp upserts are published before deletes.
+UPSERT = 0
+DELETE = 1
+
+
+class CursorError(ValueError):
+    pass
+
+
+class CursorExpired(CursorError):
+    pass
+
+
+def encode_cursor(position):
+    changed_at, kind, pk = position
+    cursor = json.dumps([changed_at.isoformat(), kind, pk])
+    return base64.urlsafe_b64encode(cursor.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(encoded):
+    """
+    Reads a (changed_at, kind, id) position, refusing positions older than the
+    tombstone retention since deletes before them may already be pruned.
+    """
+    try:
+        padded = encoded + "=" * (-len(encoded) % 4)
+        changed_at, kind, pk = json.loads(base64.urlsafe_b64decode(padded))
+        changed_at = parse_datetime(changed_at)
+    except (TypeError, ValueError, binascii.Error):
+        raise CursorError("Invalid cursor")
+    if changed_at is None or kind not in (UPSERT, DELETE) or not isinstance(pk, int):
+        raise CursorError("Invalid cursor")
+    # Cursors are issued with aware timestamps; a naive one was not made by the feed.
+    if timezone.is_naive(changed_at):
+        raise CursorError("Invalid cursor")
+
+    retention = timedelta(days=settings.PRODUCT_TOMBSTONE_RETENTION_DAYS)
+    if changed_at < timezone.now() - retention:
+        raise CursorExpired("Cursor expired, sync the full catalog again")
+    return changed_at, kind, pk
+
+
+def after(position, time_field, id_field, kind):
+    """
+    Rows of one stream that come strictly after position in (time, kind, id) order.
+    """
+    if position is None:
+        return Q()
+    changed_at, cursor_kind, pk = position
+    if kind > cursor_kind:
+        return Q(**{f"{time_field}__gte": changed_at})
+    if kind < cursor_kind:
+        return Q(**{f"{time_field}__gt": changed_at})
+    # The leading >= keeps this a single range scan of the (time, id) index.
+    return Q(**{f"{time_field}__gte": changed_at}) & (
+        Q(**{f"{time_field}__gt": changed_at}) | Q(**{f"{id_field}__gt": pk})
+    )
+
+
+def read_changes(products, position, limit):
+    """
+    Returns up to limit (changed_at, kind, id, product) changes after position, the
+    cursor position to continue from and whether more changes are already waiting.
+    Each stream is read as a range scan of its (time, id) index.
+    """
+    until = timezone.now() - CHANGE_FEED_LAG
+    upserts = (
+        products.filter(after(position, "updated_at", "id", UPSERT))
+        .filter(updated_at__lte=until)
+        .order_by("updated_at", "id")[: limit + 1]
+    )
+    deletes = (
+        ProductTombstone.objects.filter(
+            after(position, "deleted_at", "product_id", DELETE)
+        )
+        .filter(deleted_at__lte=until)
+        .order_by("deleted_at", "product_id")
+        .values_list("deleted_at", "product_id")[: limit + 1]
+    )
+    changes = sorted(
+        [(p.updated_at, UPSERT, p.pk, p) for p in upserts]
+        + [(deleted_at, DELETE, pk, None) for deleted_at, pk in deletes],
+        key=lambda change: change[:3],
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    if changes:
+        position = changes[-1][:3]
+    if not has_more:
+        # Caught up: everything up to the lag horizon has been published, so idle
+        # clients keep a fresh cursor instead of one that ages past the retention.
+        caught_up = (until, DELETE, 0)
+        if position is None or position < caught_up:
+            position = caught_up
+    return changes, position, has_more
+
+
+def changed_since(watermark, fields):
+    """
+    Returns the given fields of products saved since watermark, the ids of products
+    deleted since then and the watermark to continue from. Per-process caches use it
+    to drop or patch only the products that changed when the catalog version moves.
+    """
+    since = watermark - REFRESH_OVERLAP
+    rows = list(
+        Product.objects.filter(updated_at__gte=since)
+        .order_by()
+        .values_list("updated_at", *fields)
+    )
+    deleted = list(
+        ProductTombstone.objects.filter(deleted_at__gte=since).values_list(
+            "deleted_at", "product_id"
+        )
+    )
+    for changed_at, *_ in rows + deleted:
+        watermark = max(watermark, changed_at)
+    return [row[1:] for row in rows], [pk for _, pk in deleted], watermark
@@ -0,0 +1,115 @@
+from decimal import Decimal, InvalidOperation
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+from .models import STOCK_MARGIN
+
+TRUE_VALUES = ("1", "true", "yes")
+FALSE_VALUES = ("0", "false", "no")
+
+
+class ProductFilterBackend(BaseFilterBackend):
+    """
+    Catalog filters: ?min_price= and ?max_price= served by the (price, quantity)
+    index, ?in_stock= by quantity and ?updated_since= by (updated_at, id).
+    ?low_stock= compares each product with its own threshold through the stock margin
+    expression index.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        errors = {}
+
+        for param, lookup in [("min_price", "price__gte"), ("max_price", "price__lte")]:
+            if params.get(param):
+                try:
+                    value = Decimal(params[param])
+                    if not value.is_finite():
+                        raise InvalidOperation
+                except InvalidOperation:
+                    errors[param] = "Enter a number."
+                else:
+                    queryset = queryset.filter(**{lookup: value})
+
+        in_stock = self.parse_boolean(params, "in_stock", errors)
+        if in_stock is True:
+            queryset = queryset.filter(quantity__gt=0)
+        elif in_stock is False:
+            queryset = queryset.filter(quantity=0)
+
+        low_stock = self.parse_boolean(params, "low_stock", errors)
+        if low_stock is True:
+            queryset = queryset.alias(stock_margin=STOCK_MARGIN).filter(
+                stock_margin__lt=0
+            )
+        elif low_stock is False:
+            queryset = queryset.alias(stock_margin=STOCK_MARGIN).filter(
+                stock_margin__gte=0
+            )
+
+        if params.get("updated_since"):
+            try:
+                updated_since = parse_datetime(params["updated_since"])
+            except ValueError:
+                # Well formed but out of range, like month 13.
+                updated_since = None
+            if updated_since is None:
+                errors["updated_since"] = "Enter an ISO 8601 datetime."
+            else:
+                if timezone.is_naive(updated_since):
+                    updated_since = timezone.make_aware(updated_since)
+                queryset = queryset.filter(updated_at__gte=updated_since)
+
+        if errors:
+            raise ValidationError(errors)
+        return queryset
+
+    def parse_boolean(self, params, param, errors):
+        value = params.get(param, "").lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        if value:
+            errors[param] = "Enter true or false."
+        return None
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            ("min_price", "number", "Lowest price to include."),
+            ("max_price", "number", "Highest price to include."),
+            ("in_stock", "boolean", "Only products with (or without) stock."),
+            ("low_stock", "boolean", "Only products below their low stock threshold."),
+            ("updated_since", "string", "Only products updated at or after this time."),
+        ]
+        return [
+            {
+                "name": name,
+                "required": False,
+                "in": "query",
+                "description": description,
+                "schema": {"type": schema_type},
+            }
+            for name, schema_type, description in parameters
+        ]
+
+
+class ProductOrderingFilter(OrderingFilter):
+    """
+    ?ordering= restricted to indexed columns, with the id as a tiebreaker so the order
+    is total and keyset pagination can continue after any row.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        ordering = list(ordering)
+        # Price ties are broken by quantity like the (price, quantity) index, so the
+        # index still delivers rows in order.
+        if len(ordering) == 1 and ordering[0].lstrip("-") == "price":
+            ordering.append(ordering[0].replace("price", "quantity"))
+        if not {"id", "-id"} & set(ordering):
+            ordering.append("-id" if ordering[-1].startswith("-") else "id")
+        return ordering
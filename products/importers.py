@@ -0,0 +1,188 @@
+import codecs
+import csv
+import json
+from django.db import IntegrityError, connection, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, empty
+from rest_framework.validators import UniqueValidator
+from .models import Product
+from .serializers import ProductSerializer
+from .signals import products_changed
+
+FORMATS = ("csv", "jsonl")
+IMPORT_BATCH_SIZE = 1000
+# Only the first errors are kept, so a broken file cannot exhaust memory.
+MAX_REPORTED_ERRORS = 100
+IMPORT_FIELDS = ["name", "sku", "description", "price", "quantity"]
+UPDATE_FIELDS = ["sku", "description", "price", "quantity", "updated_at"]
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "errors": errors})
+
+    def as_dict(self):
+        return {"imported": self.imported, "failed": self.failed, "errors": self.errors}
+
+
+def guess_format(filename):
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    return {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}.get(extension)
+
+
+def read_rows(stream, file_format):
+    """
+    Yields (row number, data) from a binary CSV (with a header) or JSON Lines stream
+    without loading it whole. Rows that cannot be decoded carry their error instead.
+    """
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        try:
+            for data in reader:
+                yield reader.line_num, data
+        except csv.Error as exc:
+            yield reader.line_num, ValidationError(
+                {"non_field_errors": [f"Malformed CSV, import stopped: {exc}"]}
+            )
+        return
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            data = ValidationError({"non_field_errors": ["Invalid JSON."]})
+        yield number, data
+
+
+def row_fields():
+    """
+    Returns ProductSerializer's fields for the imported columns, so rows follow the
+    same rules as the API. A serializer per row would dominate the cost of large
+    imports, so the fields are built once and run on each row. The unique checks are
+    dropped: the name is the upsert key and SKU clashes fail the write instead.
+    """
+    serializer = ProductSerializer()
+    fields = {}
+    for name in IMPORT_FIELDS:
+        field = serializer.fields[name]
+        field.validators = [
+            validator
+            for validator in field.validators
+            if not isinstance(validator, UniqueValidator)
+        ]
+        fields[name] = field
+    return serializer, fields
+
+
+def clean_row(data, serializer, fields):
+    """
+    Validates one row with the fields from row_fields() and returns its values.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError({"non_field_errors": ["Expected an object."]})
+    values = {}
+    errors = {}
+    for name, field in fields.items():
+        try:
+            values[name] = field.run_validation(data.get(name, empty))
+        except SkipField:
+            values[name] = None
+        except ValidationError as exc:
+            errors[name] = exc.detail
+    if errors:
+        raise ValidationError(errors)
+    values["sku"] = serializer.validate_sku(values["sku"])
+    return values
+
+
+def import_products(rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Creates or updates (by name) products from (row number, data) pairs in batches.
+    Each batch is validated row by row, written with one upsert in its own transaction
+    and announced once through products_changed.
+    """
+    result = ImportResult()
+    serializer, fields = row_fields()
+    batch = {}
+    for number, data in rows:
+        try:
+            if isinstance(data, ValidationError):
+                raise data
+            values = clean_row(data, serializer, fields)
+        except ValidationError as exc:
+            result.add_error(number, exc.detail)
+            continue
+        # A name repeated within a batch keeps its last row, as a later batch would.
+        batch[values["name"]] = (number, values)
+        if len(batch) >= batch_size:
+            write_batch(list(batch.values()), result)
+            batch = {}
+    if batch:
+        write_batch(list(batch.values()), result)
+    return result
+
+
+def write_batch(batch, result):
+    rows = [values for _, values in batch]
+    try:
+        with transaction.atomic():
+            announce(upsert(rows))
+        result.imported += len(rows)
+        return
+    except IntegrityError:
+        pass
+
+    # A row clashes with another product (a taken SKU), so find it one row at a time.
+    for number, values in batch:
+        try:
+            with transaction.atomic():
+                announce(upsert([values]))
+            result.imported += 1
+        except IntegrityError:
+            result.add_error(
+                number, {"sku": ["A product with this sku already exists."]}
+            )
+
+
+def upsert(rows):
+    """
+    Writes rows by name with one multi-row INSERT ... ON CONFLICT per batch and returns
+    the ids of the saved products.
+    """
+    features = connection.features
+    # New products take the default threshold; existing ones keep theirs.
+    products = [Product(**values) for values in rows]
+    if not features.supports_update_conflicts_with_target:
+        # Without a conflict target any unique column (name or sku) updates the row,
+        # and the ids are not returned, so they are looked up by name.
+        Product.objects.bulk_create(
+            products, update_conflicts=True, update_fields=UPDATE_FIELDS
+        )
+        names = [values["name"] for values in rows]
+        return list(
+            Product.objects.filter(name__in=names).values_list("id", flat=True)
+        )
+
+    # RETURNING sets the id of inserted and updated rows alike.
+    Product.objects.bulk_create(
+        products,
+        update_conflicts=True,
+        unique_fields=["name"],
+        update_fields=UPDATE_FIELDS,
+    )
+    return [product.pk for product in products]
+
+
+def announce(product_ids):
+    products_changed.send(
+        sender=Product, product_ids=product_ids, fields=set(UPDATE_FIELDS)
+    )
@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from .models import MAX_QUANTITY, Product
+from .signals import products_changed
+
+# Most lines a single bulk update may carry.
+MAX_STOCK_CHANGES = 5000
+# Products per UPDATE, which keeps the CASE parameters well under backend limits.
+UPDATE_CHUNK_SIZE = 500
+
+
+class StockChangeError(ValueError):
+    def __init__(self, message, products):
+        super().__init__(message)
+        self.products = products
+
+
+def apply_stock_changes(changes):
+    """
+    Applies quantity deltas and new prices from validated change lines, each naming a
+    product by id or sku, in one transaction. Products are written with set-based
+    UPDATEs and announced once through products_changed. Returns the updated ids.
+    """
+    ids, skus = resolve_products(changes)
+
+    deltas = {}
+    prices = {}
+    for change in changes:
+        pk = ids[change["id"]] if "id" in change else skus[change["sku"]]
+        # Repeated lines for a product add up, and the last price wins.
+        deltas[pk] = deltas.get(pk, 0) + change.get("quantity_delta", 0)
+        if "price" in change:
+            prices[pk] = change["price"]
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    product_ids = sorted(set(deltas) | set(prices))
+
+    with transaction.atomic():
+        check_stock(deltas)
+        now = timezone.now()
+        for start in range(0, len(product_ids), UPDATE_CHUNK_SIZE):
+            chunk = product_ids[start : start + UPDATE_CHUNK_SIZE]
+            values = {"updated_at": now}
+            chunk_deltas = [(pk, deltas[pk]) for pk in chunk if pk in deltas]
+            if chunk_deltas:
+                values["quantity"] = F("quantity") + Case(
+                    *[When(pk=pk, then=Value(delta)) for pk, delta in chunk_deltas],
+                    default=Value(0),
+                )
+            chunk_prices = [(pk, prices[pk]) for pk in chunk if pk in prices]
+            if chunk_prices:
+                values["price"] = Case(
+                    *[When(pk=pk, then=Value(price)) for pk, price in chunk_prices],
+                    default=F("price"),
+                    output_field=Product._meta.get_field("price"),
+                )
+            Product.objects.filter(pk__in=chunk).update(**values)
+
+        fields = {"updated_at"}
+        if deltas:
+            fields.add("quantity")
+        if prices:
+            fields.add("price")
+        products_changed.send(sender=Product, product_ids=product_ids, fields=fields)
+    return product_ids
+
+
+def resolve_products(changes):
+    """
+    Maps the requested ids and skus to product ids with one query, raising
+    StockChangeError for codes that match no product.
+    """
+    requested_ids = {change["id"] for change in changes if "id" in change}
+    requested_skus = {change["sku"] for change in changes if "sku" in change}
+    ids = {}
+    skus = {}
+    rows = Product.objects.filter(
+        Q(pk__in=requested_ids) | Q(sku__in=requested_skus)
+    ).values_list("id", "sku")
+    for pk, sku in rows:
+        if pk in requested_ids:
+            ids[pk] = pk
+        if sku in requested_skus:
+            skus[sku] = pk
+
+    unknown = sorted(requested_ids - set(ids)) + sorted(requested_skus - set(skus))
+    if unknown:
+        raise StockChangeError("Unknown products", unknown)
+    return ids, skus
+
+
+def check_stock(deltas):
+    # Changed rows are locked and checked first, so the error names every product
+    # that would go below zero (or past MAX_QUANTITY) rather than leaving the
+    # database to fail on the first one.
+    short = []
+    over = []
+    product_ids = sorted(deltas)
+    for start in range(0, len(product_ids), UPDATE_CHUNK_SIZE):
+        rows = (
+            Product.objects.select_for_update()
+            .filter(pk__in=product_ids[start : start + UPDATE_CHUNK_SIZE])
+            .values_list("id", "quantity")
+        )
+        for pk, quantity in rows:
+            if quantity + deltas[pk] < 0:
+                short.append(pk)
+            elif quantity + deltas[pk] > MAX_QUANTITY:
+                over.append(pk)
+    if short:
+        raise StockChangeError("Not enough stock", sorted(short))
+    if over:
+        raise StockChangeError(f"Quantity cannot exceed {MAX_QUANTITY}", sorted(over))
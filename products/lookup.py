@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .cache import get_catalog_version
+from .changes import changed_since
+from .models import Product
+from .serializers import ProductSerializer
+
+# Most codes a single batch lookup may resolve.
+MAX_LOOKUP_CODES = 500
+
+
+class ProductLookupCache:
+    """
+    Per-process LRU of serialized products keyed by ("sku", code) and ("id", pk).
+    Codes that resolve to nothing are remembered too. When the catalog version moves,
+    only the entries of products saved or deleted since the last refresh are dropped.
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self.entries = OrderedDict()
+        self.keys_by_id = {}
+        self.version = None
+        self.watermark = None
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        with self.lock:
+            self.refresh()
+            found = {}
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key]
+            return found, self.version
+
+    def refresh(self):
+        version = get_catalog_version()
+        if version == self.version:
+            return
+        if self.watermark is None:
+            self.watermark = timezone.now()
+        else:
+            rows, deleted, self.watermark = changed_since(self.watermark, ["id", "sku"])
+            for pk, sku in rows:
+                # A new or re-coded product may answer a code remembered as unknown.
+                self.evict(pk)
+                self.entries.pop(("sku", sku), None)
+            for pk in deleted:
+                self.evict(pk)
+        self.version = version
+
+    def evict(self, pk):
+        self.entries.pop(("id", pk), None)
+        for key in self.keys_by_id.pop(pk, ()):
+            self.entries.pop(key, None)
+
+    def set_many(self, values, version):
+        size = self.size or settings.PRODUCT_LOOKUP_CACHE_SIZE
+        with self.lock:
+            # Rows read before a refresh may belong to products it just dropped.
+            if version != self.version:
+                return
+            for key, value in values.items():
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+                if value is not None:
+                    self.keys_by_id.setdefault(value["id"], set()).add(key)
+            while len(self.entries) > size:
+                key, value = self.entries.popitem(last=False)
+                if value is not None:
+                    self.keys_by_id.get(value["id"], set()).discard(key)
+
+
+lookup_cache = ProductLookupCache()
+
+
+def lookup_products(skus=(), ids=()):
+    """
+    Resolves SKUs and product ids to serialized products, or None for unknown codes.
+    Everything missing from the process cache is fetched with a single query.
+    """
+    keys = [("sku", sku) for sku in skus] + [("id", pk) for pk in ids]
+    found, version = lookup_cache.get_many(keys)
+
+    missing = [key for key in keys if key not in found]
+    if missing:
+        missing_skus = [code for kind, code in missing if kind == "sku"]
+        missing_ids = [code for kind, code in missing if kind == "id"]
+        fetched = dict.fromkeys(missing)
+        for product in Product.objects.filter(
+            Q(sku__in=missing_skus) | Q(pk__in=missing_ids)
+        ):
+            data = ProductSerializer(product).data
+            if ("sku", product.sku) in fetched:
+                fetched["sku", product.sku] = data
+            if ("id", product.pk) in fetched:
+                fetched["id", product.pk] = data
+        lookup_cache.set_many(fetched, version)
+        found.update(fetched)
+
+    return found
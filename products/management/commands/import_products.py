@@ -0,0 +1,45 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from products.importers import (
+    FORMATS,
+    IMPORT_BATCH_SIZE,
+    guess_format,
+    import_products,
+    read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = "Create or update products by name from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV (with a header) or JSON Lines file.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, guessed from the extension by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = options["format"] or guess_format(options["path"])
+        if file_format is None:
+            raise CommandError("Cannot guess the format, pass --format csv or jsonl.")
+
+        try:
+            with open(options["path"], "rb") as stream:
+                result = import_products(
+                    read_rows(stream, file_format), batch_size=options["batch_size"]
+                )
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for error in result.errors:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        if result.failed > len(result.errors):
+            self.stderr.write(f"... {result.failed - len(result.errors)} more errors")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result.imported} products, {result.failed} rows failed."
+            )
+        )
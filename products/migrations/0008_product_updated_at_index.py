@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_product_search_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["updated_at", "id"], name="products_pr_updated_e6e93b_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0009_product_sku"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["quantity"], name="products_pr_quantit_d0d05f_idx"
+            ),
+        ),
+    ]
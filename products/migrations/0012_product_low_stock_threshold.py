@@ -0,0 +1,60 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def record_low_stock(apps, schema_editor):
+    # Products already running low were covered by the old alerts, so they are
+    # recorded as alerted rather than reported again as new crossings.
+    Product = apps.get_model("products", "Product")
+    LowStockCrossing = apps.get_model("products", "LowStockCrossing")
+    now = timezone.now()
+    low = Product.objects.filter(quantity__lt=F("low_stock_threshold"))
+    LowStockCrossing.objects.bulk_create(
+        LowStockCrossing(product_id=pk, crossed_at=now, alerted_at=now)
+        for pk in low.values_list("id", flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0011_producttombstone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="low_stock_threshold",
+            field=models.PositiveIntegerField(default=10),
+        ),
+        migrations.CreateModel(
+            name="LowStockCrossing",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("crossed_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("alerted_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="low_stock_crossing",
+                        to="products.product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(record_low_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0012_product_low_stock_threshold"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryReport",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("watermark", models.DateTimeField()),
+                ("changed_only", models.BooleanField(default=False)),
+                ("product_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "get_latest_by": "watermark",
+            },
+        ),
+    ]
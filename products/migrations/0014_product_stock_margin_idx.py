@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:44
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0013_inventoryreport"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                django.db.models.expressions.CombinedExpression(
+                    models.F("quantity"), "-", models.F("low_stock_threshold")
+                ),
+                name="product_stock_margin_idx",
+            ),
+        ),
+    ]
@@ -1,9 +1,18 @@
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 
+# Products with fewer units than their threshold, by default this, are running low.
+LOW_STOCK_THRESHOLD = 10
+# Largest quantity a PositiveIntegerField holds on every supported backend.
+MAX_QUANTITY = 2147483647
+# Units left above the product's threshold; negative while it is running low.
+STOCK_MARGIN = models.F("quantity") - models.F("low_stock_threshold")
+
 
 class Product(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     description = models.TextField()
     price = models.DecimalField(
         max_digits=10,
@@ -11,6 +20,7 @@ class Product(models.Model):
         validators=[MinValueValidator(1.00)],
     )
     quantity = models.PositiveIntegerField(default=0)
+    low_stock_threshold = models.PositiveIntegerField(default=LOW_STOCK_THRESHOLD)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -19,4 +29,51 @@ class Product(models.Model):
 
     class Meta:
         ordering = ["price", 'quantity']
-        indexes = [models.Index(fields=["price", 'quantity'])]
+        indexes = [
+            models.Index(fields=["price", 'quantity']),
+            models.Index(fields=["updated_at", "id"]),
+            models.Index(fields=["quantity"]),
+            # Serves the low stock filter, which compares each product with its own
+            # threshold through STOCK_MARGIN.
+            models.Index(STOCK_MARGIN, name="product_stock_margin_idx"),
+        ]
+
+
+class ProductTombstone(models.Model):
+    """
+    Marks a deleted product for the change feed, which can no longer read its row.
+    """
+
+    product_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["deleted_at", "product_id"])]
+
+
+class LowStockCrossing(models.Model):
+    """
+    A product that fell below its low stock threshold. The row is removed once the
+    product recovers, so only the crossing itself raises an alert.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, related_name="low_stock_crossing"
+    )
+    crossed_at = models.DateTimeField(default=timezone.now)
+    alerted_at = models.DateTimeField(null=True, blank=True)
+
+
+class InventoryReport(models.Model):
+    """
+    A sent daily inventory report. Its watermark is where the next report of changed
+    products starts.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    watermark = models.DateTimeField()
+    changed_only = models.BooleanField(default=False)
+    product_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        get_latest_by = "watermark"
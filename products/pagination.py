@@ -1,5 +1,145 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class ProductPagination(PageNumberPagination):
     page_size = 50
+
+
+class ProductCursorPagination(BasePagination):
+    """
+    Keyset pagination for the product catalog. Every page continues strictly after the
+    last row of the previous one on the (price, quantity, id) ordering, or the one picked
+    with ?ordering=, so deep pages cost the same as the first and no COUNT(*) is issued.
+    """
+
+    page_size = 50
+    cursor_query_param = "cursor"
+    ordering = ("price", "quantity", "id")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(request, queryset, view)
+        position = self.decode_cursor(request, queryset.model)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.rows_after(position))
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        """
+        The ordering applied by the view's ordering filter, or the default one.
+        """
+        return tuple(queryset.query.order_by) or self.ordering
+
+    def rows_after(self, position):
+        """
+        Builds the lexicographic "(f1, f2, ...) > (v1, v2, ...)" filter for the ordering.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        # The leading bound lets the index seek to the cursor instead of scanning
+        # every earlier row to evaluate the OR.
+        first = self.ordering[0]
+        lookup = "lte" if first.startswith("-") else "gte"
+        return Q(**{f"{first.lstrip('-')}__{lookup}": position[0]}) & condition
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            ordering, position = cursor["o"], cursor["p"]
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            ordering != list(self.ordering)
+            or not isinstance(position, list)
+            or len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                self.parse_cursor_value(model, field.lstrip("-"), value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError, ArithmeticError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def parse_cursor_value(self, model, name, value):
+        # A tampered position must not reach the query; every ordering column is
+        # NOT NULL, so a missing value is invalid too.
+        if value is None or isinstance(value, (bool, list, dict)):
+            raise ValueError(value)
+        value = model._meta.get_field(name).to_python(value)
+        if value is None or (hasattr(value, "is_finite") and not value.is_finite()):
+            raise ValueError(value)
+        return value
+
+    def encode_cursor(self, row):
+        position = [
+            self.cursor_value(getattr(row, field.lstrip("-")))
+            for field in self.ordering
+        ]
+        cursor = json.dumps({"o": list(self.ordering), "p": position})
+        encoded = base64.urlsafe_b64encode(cursor.encode("ascii")).decode("ascii")
+        return encoded.rstrip("=")
+
+    def cursor_value(self, value):
+        if isinstance(value, (int, str)) or value is None:
+            return value
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return str(value)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            }
+        ]
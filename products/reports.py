@@ -0,0 +1,48 @@
+import csv
+from django.utils import timezone
+from .changes import CHANGE_FEED_LAG
+from .models import InventoryReport, Product
+
+REPORT_FIELDS = [
+    "id",
+    "sku",
+    "name",
+    "quantity",
+    "low_stock_threshold",
+    "price",
+    "updated_at",
+]
+# Rows fetched per round trip; on PostgreSQL through a server-side cursor.
+REPORT_CHUNK_SIZE = 2000
+
+
+def write_inventory_report(stream, changed_only=False):
+    """
+    Writes the inventory as CSV to a text stream, row by row, and returns the unsaved
+    InventoryReport describing it. With changed_only, only products updated since the
+    previous report's watermark are listed.
+    """
+    # Rows saved by transactions still in flight land behind the lag, so they are
+    # picked up by the next report instead of being skipped.
+    watermark = timezone.now() - CHANGE_FEED_LAG
+    products = Product.objects.filter(updated_at__lte=watermark)
+    previous = InventoryReport.objects.order_by("-watermark").first()
+    if changed_only and previous is not None:
+        products = products.filter(updated_at__gt=previous.watermark).order_by(
+            "updated_at", "id"
+        )
+    else:
+        products = products.order_by("id")
+
+    writer = csv.writer(stream)
+    writer.writerow(REPORT_FIELDS)
+    count = 0
+    rows = products.values_list(*REPORT_FIELDS)
+    for row in rows.iterator(chunk_size=REPORT_CHUNK_SIZE):
+        writer.writerow(row)
+        count += 1
+    return InventoryReport(
+        watermark=watermark,
+        changed_only=changed_only and previous is not None,
+        product_count=count,
+    )
@@ -0,0 +1,142 @@
+import re
+from django.db import connections
+from django.db.models import Q
+from .models import Product
+
+SQLITE_TRIGGERS = {
+    "products_product_fts_insert": """
+        CREATE TRIGGER IF NOT EXISTS products_product_fts_insert
+        AFTER INSERT ON products_product BEGIN
+            INSERT INTO products_product_fts(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+    "products_product_fts_delete": """
+        CREATE TRIGGER IF NOT EXISTS products_product_fts_delete
+        AFTER DELETE ON products_product BEGIN
+            INSERT INTO products_product_fts(products_product_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    """,
+    "products_product_fts_update": """
+        CREATE TRIGGER IF NOT EXISTS products_product_fts_update
+        AFTER UPDATE OF name, description ON products_product BEGIN
+            INSERT INTO products_product_fts(products_product_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO products_product_fts(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+}
+
+SQLITE_COUNT = (
+    "SELECT COUNT(*) FROM products_product_fts WHERE products_product_fts MATCH %s"
+)
+# Name matches weigh ten times more than description matches. bm25() is lower for
+# better matches.
+SQLITE_PAGE = """
+    SELECT rowid FROM products_product_fts WHERE products_product_fts MATCH %s
+    ORDER BY bm25(products_product_fts, 10.0, 1.0), rowid LIMIT %s OFFSET %s
+"""
+
+POSTGRESQL_COUNT = """
+    SELECT COUNT(*) FROM products_product
+    WHERE search_vector @@ websearch_to_tsquery('english', %s)
+"""
+POSTGRESQL_PAGE = """
+    SELECT id FROM products_product, websearch_to_tsquery('english', %s) query
+    WHERE search_vector @@ query
+    ORDER BY ts_rank(search_vector, query) DESC, id LIMIT %s OFFSET %s
+"""
+
+
+def install_search_triggers(connection):
+    """
+    Creates the SQLite triggers that keep the FTS5 table in sync with products_product,
+    rebuilding the index if any of them was missing.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE tbl_name IN (%s, %s)",
+            [Product._meta.db_table, "products_product_fts"],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        # Nothing to sync before the index migration has run.
+        if "products_product_fts" not in existing:
+            return
+        if existing.issuperset(SQLITE_TRIGGERS):
+            return
+        for sql in SQLITE_TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(
+            "INSERT INTO products_product_fts(products_product_fts) VALUES ('rebuild')"
+        )
+
+
+def fts5_query(query):
+    """
+    Turns free text into an FTS5 expression matching every word, the last one as a
+    prefix, so user input never reaches the query syntax.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+class RankedSearchResults:
+    """
+    Products ranked by the database's full-text index. Only the ids of the requested
+    slice are ranked and fetched, so Django's Paginator can page through it.
+    """
+
+    def __init__(self, queryset, expression, count_sql, page_sql):
+        self.queryset = queryset
+        self.expression = expression
+        self.count_sql = count_sql
+        self.page_sql = page_sql
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.fetch(self.count_sql, [self.expression])[0][0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            raise TypeError("RankedSearchResults only supports slicing")
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if stop <= start:
+            return []
+        rows = self.fetch(self.page_sql, [self.expression, stop - start, start])
+        ids = [row[0] for row in rows]
+        products = self.queryset.in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+    def fetch(self, sql, params):
+        with connections[self.queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+def search_products(queryset, query):
+    """
+    Searches product names and descriptions, best matches first.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        expression = fts5_query(query)
+        if expression is None:
+            return queryset.none()
+        return RankedSearchResults(queryset, expression, SQLITE_COUNT, SQLITE_PAGE)
+    if vendor == "postgresql":
+        return RankedSearchResults(queryset, query, POSTGRESQL_COUNT, POSTGRESQL_PAGE)
+    return queryset.filter(
+        Q(name__icontains=query) | Q(description__icontains=query)
+    ).order_by("name", "id")
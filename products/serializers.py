@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Product
+from .models import MAX_QUANTITY, Product
+from .inventory import MAX_STOCK_CHANGES
 from decimal import Decimal
 
 
@@ -11,10 +12,139 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = [
             "id",
             "name",
+            "sku",
             "description",
             "price",
             "quantity",
+            "low_stock_threshold",
             "created_at",
             "updated_at",
         ]
         read_only_fields = ["created_at", "updated_at"]
+
+    def validate_sku(self, value):
+        # Products without a code store NULL, which the unique index allows repeatedly.
+        return value or None
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ProductImportResultSerializer(serializers.Serializer):
+    imported = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    errors = serializers.ListField(child=serializers.DictField())
+
+
+class ProductStockChangeSerializer(serializers.Serializer):
+    """
+    One line of a bulk stock update: a product by id or sku with a quantity delta
+    (negative to remove stock) and/or a new price.
+    """
+
+    id = serializers.IntegerField(required=False)
+    sku = serializers.CharField(max_length=64, required=False)
+    quantity_delta = serializers.IntegerField(
+        min_value=-MAX_QUANTITY, max_value=MAX_QUANTITY, required=False
+    )
+    price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal("0.01"), required=False
+    )
+
+    def validate(self, attrs):
+        if ("id" in attrs) == ("sku" in attrs):
+            raise serializers.ValidationError("Pass either id or sku.")
+        if "quantity_delta" not in attrs and "price" not in attrs:
+            raise serializers.ValidationError("Pass quantity_delta, price or both.")
+        return attrs
+
+
+class ProductBulkUpdateSerializer(serializers.Serializer):
+    changes = ProductStockChangeSerializer(
+        many=True, allow_empty=False, max_length=MAX_STOCK_CHANGES
+    )
+
+
+class ProductBulkUpdateResultSerializer(serializers.Serializer):
+    updated = serializers.IntegerField()
+
+
+class ProductSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact product reference used by cart and bill lines.
+    """
+
+    class Meta:
+        model = Product
+        fields = ["id", "name", "price"]
+        read_only_fields = fields
+
+
+class ProductNameSerializer(serializers.ModelSerializer):
+    """
+    Name match returned by product autocomplete.
+    """
+
+    class Meta:
+        model = Product
+        fields = ["id", "name"]
+        read_only_fields = fields
+
+
+class ProductLookupSerializer(serializers.Serializer):
+    """
+    Batch lookup result: every requested SKU and id mapped to its product or null.
+    """
+
+    skus = serializers.DictField(child=ProductSerializer(allow_null=True))
+    ids = serializers.DictField(child=ProductSerializer(allow_null=True))
+
+
+class ProductChangeSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=["upsert", "delete"])
+    id = serializers.IntegerField()
+    product = ProductSerializer(required=False)
+
+
+class ProductChangesSerializer(serializers.Serializer):
+    """
+    A page of the catalog change feed.
+    """
+
+    results = ProductChangeSerializer(many=True)
+    cursor = serializers.CharField(allow_null=True)
+    has_more = serializers.BooleanField()
+
+
+def wants_compact(request):
+    """
+    Whether the request asked for compact lines with ?compact=true.
+    """
+    if request is None:
+        return False
+    return request.query_params.get("compact", "").lower() in ("1", "true", "yes")
+
+
+def sparse_fields(request):
+    """
+    The product fields a read selected with ?fields=a,b or ?exclude=a,b, or None for all.
+    """
+    if request is None:
+        return None
+    include = [f for f in request.query_params.get("fields", "").split(",") if f]
+    exclude = [f for f in request.query_params.get("exclude", "").split(",") if f]
+    if not include and not exclude:
+        return None
+
+    available = ProductSerializer.Meta.fields
+    unknown = [f for f in include + exclude if f not in available]
+    if unknown:
+        raise serializers.ValidationError(
+            {"fields": f"Unknown product fields: {', '.join(unknown)}"}
+        )
+    return [
+        f for f in available if (not include or f in include) and f not in exclude
+    ]
@@ -1,10 +1,44 @@
-from .tasks import check_low_quantity_products
-from django.dispatch import receiver
-from django.db.models.signals import post_save
-from .models import Product
+from django.dispatch import Signal, receiver
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save
+from .alerts import record_stock_levels
+from .cache import bump_catalog_version_on_commit
+from .models import Product, ProductTombstone
+from .search import install_search_triggers
+
+# Sent once for a batch of products written with set-based queries that bypass
+# Product.save(), with their ids and the names of the fields that may have changed.
+products_changed = Signal()
+
+# Writes to these fields can move a product across its low stock threshold.
+STOCK_FIELDS = {"quantity", "low_stock_threshold"}
+
+
+@receiver(post_save, sender=Product)
+def check_product_quantity(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or STOCK_FIELDS & set(update_fields):
+        record_stock_levels([instance.pk])
 
 
 @receiver(post_save, sender=Product)
-def check_product_quantity(sender, instance, **kwargs):
-    if instance.quantity < 10:
-        check_low_quantity_products.delay()
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    bump_catalog_version_on_commit()
+
+
+@receiver(post_delete, sender=Product)
+def record_product_tombstone(sender, instance, **kwargs):
+    ProductTombstone.objects.create(product_id=instance.pk)
+
+
+@receiver(products_changed)
+def handle_products_changed(sender, product_ids, fields, **kwargs):
+    bump_catalog_version_on_commit()
+    if STOCK_FIELDS & set(fields):
+        record_stock_levels(product_ids)
+
+
+@receiver(post_migrate)
+def install_product_search_triggers(sender, using, **kwargs):
+    if sender.name == "products":
+        install_search_triggers(connections[using])
@@ -1,49 +1,119 @@
+import tempfile
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import storages
 from django.conf import settings
-from .models import Product
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .cache import LOW_STOCK_ALERT_KEY
+from .models import LowStockCrossing, Product, ProductTombstone
+from .reports import write_inventory_report
 from accounts.models import User
+from notifications.outbox import queue_email, stored_attachment
+
+# Reports up to this size stay in memory; larger ones spill to a temporary file.
+REPORT_SPOOL_SIZE = 5 * 1024 * 1024
 
 
 @shared_task
 def check_low_quantity_products():
-    low_quantity_products = Product.objects.filter(quantity__lt=10)
-    if low_quantity_products:
-        employees = User.objects.filter(role=User.Role.EMPLOYEE)
-        employee_emails = [employee.email for employee in employees]
-
-        subject = "Low Product Quantity Alert"
-        message = "The following products have quantity below 10:\n\n"
-        for product in low_quantity_products:
-            message += f"{product.name}: {product.quantity}\n"
-
-        try:
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                employee_emails,
-                fail_silently=False,
-            )
-        except Exception as e:
-            print(f"Failed to send email: {str(e)}")
+    """
+    Sends the low stock alert for crossings it never reached, for instance because the
+    debounced task was lost. Products that were already alerted are not repeated.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.LOW_STOCK_ALERT_DEBOUNCE)
+    if LowStockCrossing.objects.filter(
+        alerted_at__isnull=True, crossed_at__lt=cutoff
+    ).exists():
+        send_low_stock_alert()
+
+
+@shared_task
+def send_daily_product_update(changed_only=None):
+    """
+    Emails employees the inventory as a CSV attachment, optionally limited to products
+    changed since the previous report. The report is streamed from the database into
+    a spooled file and stored, and the email only references it.
+    """
+    if changed_only is None:
+        changed_only = settings.DAILY_PRODUCT_REPORT_CHANGED_ONLY
+    employee_emails = list(
+        User.objects.filter(role=User.Role.EMPLOYEE).values_list("email", flat=True)
+    )
+
+    with tempfile.SpooledTemporaryFile(
+        max_size=REPORT_SPOOL_SIZE, mode="w+", newline="", encoding="utf-8"
+    ) as stream:
+        report = write_inventory_report(stream, changed_only)
+        stream.seek(0)
+        filename = f"inventory_{report.watermark:%Y-%m-%d}.csv"
+        name = storages["reports"].save(f"inventory/{filename}", File(stream))
+
+    if report.changed_only:
+        body = f"{report.product_count} products changed since the last report."
+    else:
+        body = f"Here's the current inventory of {report.product_count} products."
+    # The watermark only moves once the report is queued for sending.
+    with transaction.atomic():
+        queue_email(
+            "Daily Product Update",
+            f"{body} The full list is attached.",
+            employee_emails,
+            attachments=[stored_attachment("reports", name, filename, "text/csv")],
+        )
+        report.save()
+
+
+@shared_task
+def prune_inventory_reports():
+    """
+    Deletes stored inventory report files older than REPORT_RETENTION_DAYS.
+    """
+    storage = storages["reports"]
+    if not storage.exists("inventory"):
+        return
+    cutoff = timezone.now() - timedelta(days=settings.REPORT_RETENTION_DAYS)
+    for filename in storage.listdir("inventory")[1]:
+        name = f"inventory/{filename}"
+        if storage.get_modified_time(name) < cutoff:
+            storage.delete(name)
+
+
+@shared_task
+def prune_product_tombstones():
+    cutoff = timezone.now() - timedelta(days=settings.PRODUCT_TOMBSTONE_RETENTION_DAYS)
+    ProductTombstone.objects.filter(deleted_at__lt=cutoff).delete()
 
 
 @shared_task
-def send_daily_product_update():
-    products = Product.objects.all()
-    employees = User.objects.filter(role=User.Role.EMPLOYEE)
-    employee_emails = [employee.email for employee in employees]
-
-    subject = "Daily Product Update"
-    message = "Here's the current product inventory:\n\n"
-    for product in products:
-        message += f"{product.name}: {product.quantity}\n"
-
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        employee_emails,
-        fail_silently=False,
+def send_low_stock_alert():
+    """
+    Emails employees the products that fell below their threshold since the last
+    alert. Queued at most once per debounce window by products.alerts.
+    """
+    # Crossings committed from here on queue the next alert instead of this one.
+    cache.delete(LOW_STOCK_ALERT_KEY)
+    crossings = list(
+        LowStockCrossing.objects.filter(alerted_at__isnull=True)
+        .select_related("product")
+        .order_by("crossed_at")
+    )
+    if not crossings:
+        return
+
+    employee_emails = list(
+        User.objects.filter(role=User.Role.EMPLOYEE).values_list("email", flat=True)
+    )
+    message = "The following products fell below their low stock threshold:\n\n"
+    message += "".join(
+        f"{crossing.product.name}: {crossing.product.quantity} "
+        f"(threshold {crossing.product.low_stock_threshold})\n"
+        for crossing in crossings
     )
+    with transaction.atomic():
+        queue_email("Low Stock Alert", message, employee_emails)
+        LowStockCrossing.objects.filter(
+            pk__in=[crossing.pk for crossing in crossings]
+        ).update(alerted_at=timezone.now())
@@ -1,16 +1,74 @@
+import base64
+import csv
+import json
+import msgpack
+import tempfile
+import warnings
+from datetime import timedelta
+from io import StringIO
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
 from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
 from rest_framework import status
 
 from accounts.models import User
-from products.models import Product
+from accounts.renderers import msgpack_default, msgpack_ext_hook
+from products.models import (
+    MAX_QUANTITY,
+    InventoryReport,
+    LowStockCrossing,
+    Product,
+)
+from products.signals import products_changed
+from products.tasks import (
+    check_low_quantity_products,
+    prune_inventory_reports,
+    send_daily_product_update,
+    send_low_stock_alert,
+)
+from notifications.tasks import dispatch_outbound_emails
+from products.autocomplete import NameIndex
+from products.changes import UPSERT, encode_cursor
+from products.importers import clean_row, import_products, row_fields
+from products.search import search_products
+from products.lookup import ProductLookupCache
+from products.pagination import ProductCursorPagination
 from products.views import ProductViewSet
 from products.serializers import ProductSerializer
 
 
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+IN_MEMORY_STORAGES = {
+    **settings.STORAGES,
+    "reports": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
 class ProductAPITestCase(APITestCase):
     def setUp(self):
+        cache.clear()
         self.factory = APIRequestFactory()
         self.product = Product.objects.create(
             name="Product", description="Description", price=100, quantity=10
@@ -128,3 +186,797 @@ class ProductAPITestCase(APITestCase):
         response = view(request, pk=self.product.pk)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertEqual(Product.objects.count(), 1)
+
+    def test_quantity_cannot_go_negative(self):
+        # Guaranteed by the CHECK that PositiveIntegerField creates, which the
+        # conditional stock UPDATEs at checkout rely on.
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Product.objects.filter(pk=self.product.pk).update(
+                quantity=F("quantity") - 11
+            )
+
+    def test_cursor_pagination_walks_catalog(self):
+        for index in range(6):
+            Product.objects.create(
+                name=f"Product {index}",
+                description="Description",
+                price=50 + index % 2,
+                quantity=20,
+            )
+        expected = list(
+            Product.objects.order_by("price", "quantity", "id").values_list(
+                "id", flat=True
+            )
+        )
+
+        seen = []
+        params = {"pagination": "cursor"}
+        with mock.patch.object(ProductCursorPagination, "page_size", 3):
+            with CaptureQueriesContext(connection) as queries:
+                while True:
+                    request = self.factory.get(reverse("product-list"), params)
+                    response = self.view(request)
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    seen.extend(item["id"] for item in response.data["results"])
+                    if not response.data["next"]:
+                        break
+                    query = urlparse(response.data["next"]).query
+                    params = {"cursor": parse_qs(query)["cursor"][0]}
+
+        self.assertEqual(seen, expected)
+        self.assertFalse(any("COUNT(" in q["sql"] for q in queries.captured_queries))
+
+    def test_cursor_pagination_rejects_invalid_cursor(self):
+        request = self.factory.get(reverse("product-list"), {"cursor": "garbage"})
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        ordering = ["price", "quantity", "id"]
+        for position in [["abc", 1, 2], ["NaN", 1, 2], [None, 1, 2], ["1", [], 2]]:
+            with self.subTest(position=position):
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps({"o": ordering, "p": position}).encode()
+                ).decode()
+                request = self.factory.get(reverse("product-list"), {"cursor": cursor})
+                response = self.view(request)
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_pagination_seeks_to_cursor(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("Query plans are asserted on SQLite")
+        paginator = ProductCursorPagination()
+        for ordering in [("price", "quantity", "id"), ("-price", "-quantity", "-id")]:
+            with self.subTest(ordering=ordering):
+                paginator.ordering = ordering
+                plan = (
+                    Product.objects.order_by(*ordering)
+                    .filter(paginator.rows_after([Decimal("50"), 10, 3]))
+                    .explain()
+                )
+                self.assertIn("SEARCH", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_product_list_is_served_from_cache(self):
+        request = self.factory.get(reverse("product-list"))
+        self.view(request)
+        with self.assertNumQueries(0):
+            response = self.view(self.factory.get(reverse("product-list")))
+        self.assertEqual(response.data["count"], 1)
+
+    def test_product_save_invalidates_cache(self):
+        view = ProductViewSet.as_view({"get": "retrieve"})
+        url = reverse("product-detail", kwargs={"pk": self.product.pk})
+        view(self.factory.get(url), pk=self.product.pk)
+        self.view(self.factory.get(reverse("product-list")))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = "Renamed Product"
+            self.product.save()
+
+        response = view(self.factory.get(url), pk=self.product.pk)
+        self.assertEqual(response.data["name"], "Renamed Product")
+        response = self.view(self.factory.get(reverse("product-list")))
+        self.assertEqual(response.data["results"][0]["name"], "Renamed Product")
+
+    def test_product_list_answers_not_modified(self):
+        response = self.view(self.factory.get(reverse("product-list")))
+        etag = response["ETag"]
+
+        request = self.factory.get(reverse("product-list"), HTTP_IF_NONE_MATCH=etag)
+        with self.assertNumQueries(0):
+            response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        request = self.factory.get(reverse("product-list"), HTTP_IF_NONE_MATCH=etag)
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_single_product_answers_not_modified_since(self):
+        view = ProductViewSet.as_view({"get": "retrieve"})
+        url = reverse("product-detail", kwargs={"pk": self.product.pk})
+        response = view(self.factory.get(url), pk=self.product.pk)
+        last_modified = response["Last-Modified"]
+
+        request = self.factory.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        response = view(request, pk=self.product.pk)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_single_product_not_modified_skips_payload(self):
+        view = ProductViewSet.as_view({"get": "retrieve"})
+        url = reverse("product-detail", kwargs={"pk": self.product.pk})
+        response = view(self.factory.get(url), pk=self.product.pk)
+        etag = response["ETag"]
+
+        request = self.factory.get(url, HTTP_IF_NONE_MATCH=etag)
+        with mock.patch("products.views.cached_catalog_response") as cached:
+            response = view(request, pk=self.product.pk)
+        cached.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertIn("Accept", response["Vary"])
+        self.assertIn("Last-Modified", response)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        request = self.factory.get(url, HTTP_IF_NONE_MATCH=etag)
+        response = view(request, pk=self.product.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_product_list_renders_json(self):
+        response = self.view(self.factory.get(reverse("product-list")))
+        response.render()
+        body = json.loads(response.content)
+        self.assertEqual(body["results"][0]["price"], "100.00")
+        self.assertEqual(response["Content-Type"], "application/json; charset=utf-8")
+
+    def test_errors_are_wrapped(self):
+        view = ProductViewSet.as_view({"get": "retrieve"})
+        response = view(self.factory.get("/api/products/0/"), pk=0)
+        response.render()
+        self.assertEqual(
+            json.loads(response.content),
+            {"errors": {"detail": "No Product matches the given query."}},
+        )
+
+    def test_product_list_renders_msgpack(self):
+        request = self.factory.get(
+            reverse("product-list"), HTTP_ACCEPT="application/msgpack"
+        )
+        response = self.view(request)
+        response.render()
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        body = msgpack.unpackb(response.content, ext_hook=msgpack_ext_hook)
+        self.assertEqual(body["results"][0]["name"], "Product")
+
+        json_response = self.view(self.factory.get(reverse("product-list")))
+        self.assertNotEqual(response["ETag"], json_response["ETag"])
+
+    def test_create_product_from_msgpack(self):
+        data = {
+            "name": "Packed Product",
+            "description": "Sent as MessagePack",
+            "price": Decimal("15.25"),
+            "quantity": 50,
+        }
+        request = self.factory.post(
+            reverse("product-list"),
+            msgpack.packb(data, default=msgpack_default),
+            content_type="application/msgpack",
+        )
+        force_authenticate(request, user=self.employee)
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Product.objects.get(name="Packed Product").price, Decimal("15.25")
+        )
+
+    def test_malformed_msgpack_decimal_is_rejected(self):
+        data = {"name": "Packed Product", "price": msgpack.ExtType(1, b"12,5")}
+        request = self.factory.post(
+            reverse("product-list"),
+            msgpack.packb(data),
+            content_type="application/msgpack",
+        )
+        force_authenticate(request, user=self.employee)
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_fieldsets(self):
+        request = self.factory.get(reverse("product-list"), {"fields": "id,name"})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.view(request)
+        self.assertEqual(
+            response.data["results"][0], {"id": self.product.pk, "name": "Product"}
+        )
+        self.assertNotIn("description", queries[-1]["sql"])
+
+        request = self.factory.get(reverse("product-list"), {"exclude": "description"})
+        response = self.view(request)
+        self.assertNotIn("description", response.data["results"][0])
+        self.assertIn("updated_at", response.data["results"][0])
+
+    def test_sparse_fieldsets_with_cursor_pagination(self):
+        Product.objects.create(name="Other", description="x", price=200, quantity=20)
+        request = self.factory.get(
+            reverse("product-list"), {"pagination": "cursor", "fields": "name"}
+        )
+        with self.assertNumQueries(1):
+            response = self.view(request)
+        self.assertEqual(
+            response.data["results"], [{"name": "Product"}, {"name": "Other"}]
+        )
+
+    def test_sparse_fieldsets_reject_unknown_fields(self):
+        request = self.factory.get(reverse("product-list"), {"fields": "id,secret"})
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def search(self, query):
+        view = ProductViewSet.as_view({"get": "search"})
+        return view(self.factory.get(reverse("product-search"), {"q": query}))
+
+    def test_search_ranks_name_matches_first(self):
+        Product.objects.create(
+            name="Garden Hose", description="Keeps lamps away", price=30, quantity=20
+        )
+        Product.objects.create(
+            name="Desk Lamp", description="Bright light", price=40, quantity=20
+        )
+        response = self.search("lamp")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            [p["name"] for p in response.data["results"]], ["Desk Lamp", "Garden Hose"]
+        )
+        self.assertEqual(self.search("desk la").data["count"], 1)
+
+    def test_search_index_follows_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = "Espresso Machine"
+            self.product.save()
+        self.assertEqual(self.search("espresso").data["count"], 1)
+        self.assertEqual(self.search("product").data["count"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertEqual(self.search("espresso").data["count"], 0)
+
+    def test_search_requires_query(self):
+        self.assertEqual(self.search("").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search('"*(').data["count"], 0)
+
+    def autocomplete(self, prefix):
+        view = ProductViewSet.as_view({"get": "autocomplete"})
+        request = self.factory.get(reverse("product-autocomplete"), {"q": prefix})
+        return view(request).data
+
+    @mock.patch("products.autocomplete.name_index", new_callable=NameIndex)
+    def test_autocomplete_matches_name_prefixes(self, name_index):
+        Product.objects.create(name="Desk Lamp", description="x", price=40, quantity=20)
+        Product.objects.create(name="desk chair", description="x", price=90, quantity=20)
+        self.assertEqual(
+            [p["name"] for p in self.autocomplete("DESK")], ["desk chair", "Desk Lamp"]
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.autocomplete("desk l")), 1)
+
+    @mock.patch("products.autocomplete.name_index", new_callable=NameIndex)
+    def test_autocomplete_follows_catalog_changes(self, name_index):
+        self.assertEqual(len(self.autocomplete("prod")), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = "Widget"
+            self.product.save()
+        self.assertEqual(self.autocomplete("prod"), [])
+        self.assertEqual(
+            self.autocomplete("wid"), [{"id": self.product.pk, "name": "Widget"}]
+        )
+
+        # Other changes are applied row by row instead of rebuilding the index.
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name="Wicket", description="x", price=5, quantity=20)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.autocomplete("wi")), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertEqual(self.autocomplete("wid"), [])
+
+    def lookup(self, params):
+        view = ProductViewSet.as_view({"get": "lookup"})
+        return view(self.factory.get(reverse("product-lookup"), params))
+
+    @mock.patch("products.lookup.lookup_cache", new_callable=ProductLookupCache)
+    def test_lookup_resolves_skus_and_ids(self, lookup_cache):
+        scanned = Product.objects.create(
+            name="Scanned", description="x", price=5, quantity=20, sku="4006381333931"
+        )
+        params = {"skus": "4006381333931,0000", "ids": f"{self.product.pk}"}
+        with self.assertNumQueries(1):
+            response = self.lookup(params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["skus"]["4006381333931"]["id"], scanned.pk)
+        self.assertIsNone(response.data["skus"]["0000"])
+        self.assertEqual(
+            response.data["ids"][str(self.product.pk)]["name"], "Product"
+        )
+
+        with self.assertNumQueries(0):
+            self.lookup(params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            scanned.name = "Rescanned"
+            scanned.save()
+        response = self.lookup(params)
+        self.assertEqual(response.data["skus"]["4006381333931"]["name"], "Rescanned")
+
+        # A sale of another product only reads what changed, not the cached products.
+        other = Product.objects.create(
+            name="Other", description="x", price=5, quantity=30
+        )
+        self.lookup(params)
+        # Saved outside the window every refresh re-reads.
+        Product.objects.exclude(pk=other.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=other.pk).update(
+                quantity=29, updated_at=timezone.now()
+            )
+            products_changed.send(
+                sender=Product, product_ids=[other.pk], fields={"quantity"}
+            )
+        with self.assertNumQueries(2):
+            response = self.lookup(params)
+        self.assertEqual(response.data["skus"]["4006381333931"]["name"], "Rescanned")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            scanned.delete()
+        self.assertIsNone(self.lookup(params).data["skus"]["4006381333931"])
+
+    def test_lookup_validates_codes(self):
+        self.assertEqual(self.lookup({}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.lookup({"ids": "one"}).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        codes = ",".join(str(i) for i in range(501))
+        self.assertEqual(
+            self.lookup({"skus": codes}).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_blank_sku_is_stored_as_null(self):
+        for name in ["First", "Second"]:
+            request = self.factory.post(
+                reverse("product-list"),
+                {
+                    "name": name,
+                    "description": "x",
+                    "price": 10,
+                    "quantity": 50,
+                    "sku": "",
+                },
+            )
+            force_authenticate(request, user=self.employee)
+            response = self.view(request)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Product.objects.filter(sku__isnull=True).count(), 3)
+
+    def list_names(self, params):
+        response = self.view(self.factory.get(reverse("product-list"), params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p["name"] for p in response.data["results"]]
+
+    def test_filter_and_order_products(self):
+        Product.objects.create(name="Sold Out", description="x", price=50, quantity=0)
+        Product.objects.create(name="Cheap", description="x", price=5, quantity=20)
+        Product.objects.filter(name="Cheap").update(updated_at="2020-01-01T00:00Z")
+
+        self.assertEqual(
+            self.list_names({"min_price": "10", "max_price": "60"}), ["Sold Out"]
+        )
+        self.assertEqual(self.list_names({"in_stock": "true"}), ["Cheap", "Product"])
+        self.assertEqual(self.list_names({"in_stock": "false"}), ["Sold Out"])
+        self.assertEqual(self.list_names({"low_stock": "true"}), ["Sold Out"])
+        self.assertEqual(
+            self.list_names({"updated_since": "2021-01-01T00:00Z", "ordering": "name"}),
+            ["Product", "Sold Out"],
+        )
+        self.assertEqual(
+            self.list_names({"ordering": "-price"}), ["Product", "Sold Out", "Cheap"]
+        )
+
+    def test_naive_updated_since_uses_current_timezone(self):
+        # 17:30 in Asia/Kolkata, the project time zone.
+        Product.objects.update(updated_at="2020-01-01T12:00Z")
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            self.assertEqual(
+                self.list_names({"updated_since": "2020-01-01T17:00"}), ["Product"]
+            )
+            self.assertEqual(self.list_names({"updated_since": "2020-01-01T18:00"}), [])
+
+    def test_filters_reject_invalid_values(self):
+        for params in [
+            {"min_price": "cheap"},
+            {"min_price": "NaN"},
+            {"min_price": "sNaN"},
+            {"max_price": "Infinity"},
+            {"in_stock": "maybe"},
+            {"updated_since": "soon"},
+            {"updated_since": "2024-13-45T00:00"},
+        ]:
+            with self.subTest(params=params):
+                response = self.view(self.factory.get(reverse("product-list"), params))
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_pagination_follows_ordering(self):
+        Product.objects.create(name="Other", description="x", price=200, quantity=20)
+        request = self.factory.get(
+            reverse("product-list"), {"pagination": "cursor", "ordering": "-price"}
+        )
+        with mock.patch.object(ProductCursorPagination, "page_size", 1):
+            response = self.view(request)
+            self.assertEqual(response.data["results"][0]["name"], "Other")
+            query = parse_qs(urlparse(response.data["next"]).query)
+            request = self.factory.get(reverse("product-list"), query)
+            response = self.view(request)
+        self.assertEqual(response.data["results"][0]["name"], "Product")
+
+    def query_plan(self, params, ordered=True):
+        request = Request(self.factory.get(reverse("product-list"), params))
+        view = ProductViewSet(request=request, format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())
+        return (queryset if ordered else queryset.order_by()).explain()
+
+    def test_filters_and_orderings_use_indexes(self):
+        indexes = {tuple(index.fields): index.name for index in Product._meta.indexes}
+        cases = [
+            ({"min_price": "10", "max_price": "60"}, indexes["price", "quantity"]),
+            ({"ordering": "-price"}, indexes["price", "quantity"]),
+            ({"in_stock": "true", "ordering": "quantity"}, indexes["quantity",]),
+            (
+                {"updated_since": "2021-01-01T00:00Z", "ordering": "updated_at"},
+                indexes["updated_at", "id"],
+            ),
+            ({"ordering": "updated_at"}, indexes["updated_at", "id"]),
+            ({"ordering": "name"}, "sqlite_autoindex_products_product"),
+        ]
+        if connection.vendor != "sqlite":
+            self.skipTest("Query plans are asserted on SQLite")
+        for params, index in cases:
+            with self.subTest(params=params):
+                plan = self.query_plan(params)
+                self.assertIn(f"USING INDEX {index}", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+        # Without table statistics SQLite prefers scanning an index in ordering order
+        # over any range search, so the margin index is asserted on the bare filter.
+        for value in ["true", "false"]:
+            with self.subTest(low_stock=value):
+                plan = self.query_plan({"low_stock": value}, ordered=False)
+                self.assertIn("SEARCH", plan)
+                self.assertIn("USING INDEX product_stock_margin_idx", plan)
+
+    def poll_changes(self, params=None):
+        view = ProductViewSet.as_view({"get": "changes"})
+        return view(self.factory.get(reverse("product-changes"), params or {}))
+
+    @mock.patch("products.changes.CHANGE_FEED_LAG", timedelta(0))
+    def test_changes_feed_follows_catalog(self):
+        response = self.poll_changes()
+        self.assertEqual(
+            [(c["op"], c["id"]) for c in response.data["results"]],
+            [("upsert", self.product.pk)],
+        )
+        cursor = response.data["cursor"]
+        response = self.poll_changes({"cursor": cursor})
+        self.assertEqual(response.data["results"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.quantity = 15
+            self.product.save()
+        response = self.poll_changes({"cursor": cursor})
+        self.assertEqual(response.data["results"][0]["product"]["quantity"], 15)
+        cursor = response.data["cursor"]
+
+        deleted_pk = self.product.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        response = self.poll_changes({"cursor": cursor})
+        self.assertEqual(response.data["results"], [{"op": "delete", "id": deleted_pk}])
+
+    @mock.patch("products.changes.CHANGE_FEED_LAG", timedelta(0))
+    def test_changes_feed_pages(self):
+        Product.objects.create(name="Other", description="x", price=200, quantity=20)
+        response = self.poll_changes({"limit": 1, "fields": "id,name"})
+        self.assertTrue(response.data["has_more"])
+        self.assertEqual(
+            response.data["results"][0]["product"],
+            {"id": self.product.pk, "name": "Product"},
+        )
+        response = self.poll_changes({"limit": 1, "cursor": response.data["cursor"]})
+        self.assertFalse(response.data["has_more"])
+        self.assertEqual(response.data["results"][0]["product"]["name"], "Other")
+
+    def test_changes_feed_rejects_bad_cursors(self):
+        naive = base64.urlsafe_b64encode(b'["2026-10-18T00:00:00", 0, 1]').decode()
+        for cursor in ["garbage", naive]:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(
+                    self.poll_changes({"cursor": cursor}).status_code,
+                    status.HTTP_400_BAD_REQUEST,
+                )
+        expired = encode_cursor((timezone.now() - timedelta(days=365), UPSERT, 1))
+        self.assertEqual(
+            self.poll_changes({"cursor": expired}).status_code, status.HTTP_410_GONE
+        )
+
+    def upload_products(self, name, content, user=None):
+        view = ProductViewSet.as_view({"post": "import_products"})
+        upload = SimpleUploadedFile(name, content.encode())
+        request = self.factory.post(
+            reverse("product-import-products"), {"file": upload}, format="multipart"
+        )
+        force_authenticate(request, user=user or self.employee)
+        return view(request)
+
+    @mock.patch("products.alerts.send_low_stock_alert.apply_async")
+    def test_import_products_csv(self, alert):
+        content = (
+            "name,sku,description,price,quantity\n"
+            "Product,P-1,Restocked,120.50,40\n"
+            "Lamp,L-1,Desk lamp,25,3\n"
+            "Broken,,No price,,4\n"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload_products("products.csv", content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["imported"], 2)
+        self.assertEqual(response.data["failed"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 4)
+        self.assertIn("price", response.data["errors"][0]["errors"])
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.sku, "P-1")
+        self.assertEqual(self.product.price, Decimal("120.50"))
+        self.assertEqual(Product.objects.get(name="Lamp").quantity, 3)
+        self.assertEqual(len(search_products(Product.objects.all(), "lamp")), 1)
+        alert.assert_called_once()
+
+    def test_import_products_jsonl_reports_bad_rows(self):
+        Product.objects.create(
+            name="Other", sku="TAKEN", description="x", price=5, quantity=20
+        )
+        content = "\n".join(
+            [
+                json.dumps(
+                    {"name": "Chair", "description": "Oak", "price": 40.5, "quantity": 12}
+                ),
+                "{not json",
+                json.dumps(
+                    {
+                        "name": "Stool",
+                        "sku": "TAKEN",
+                        "description": "Pine",
+                        "price": 30,
+                        "quantity": 15,
+                    }
+                ),
+                json.dumps(
+                    {"name": "Table", "description": "Oak", "price": 1.555, "quantity": -1}
+                ),
+            ]
+        )
+        response = self.upload_products("products.jsonl", content)
+        self.assertEqual(response.data["imported"], 1)
+        self.assertEqual(
+            [error["row"] for error in response.data["errors"]], [2, 4, 3]
+        )
+        self.assertEqual(
+            set(response.data["errors"][1]["errors"]), {"price", "quantity"}
+        )
+        self.assertEqual(set(response.data["errors"][2]["errors"]), {"sku"})
+        self.assertTrue(Product.objects.filter(name="Chair").exists())
+        self.assertFalse(Product.objects.filter(name="Stool").exists())
+
+    def test_import_rows_follow_product_serializer(self):
+        serializer, fields = row_fields()
+        for row in [
+            {"name": "New", "sku": "", "description": "x", "price": "0.005"},
+            {"name": "N" * 256, "description": " ", "price": "1", "quantity": -1},
+        ]:
+            with self.subTest(row=row):
+                expected = ProductSerializer(data=row)
+                self.assertFalse(expected.is_valid())
+                with self.assertNumQueries(0):
+                    with self.assertRaises(ValidationError) as raised:
+                        clean_row(row, serializer, fields)
+                self.assertEqual(raised.exception.detail, expected.errors)
+
+    def test_import_products_requires_employee(self):
+        response = self.upload_products(
+            "products.csv", "name,description,price,quantity\n", user=self.customer
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.upload_products("products.txt", "name\n")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_products_command(self):
+        row = {"description": "x", "price": "2.50", "quantity": "30"}
+        rows = [(number, {**row, "name": f"Bulk {number}"}) for number in range(5)]
+        with mock.patch("products.importers.products_changed.send") as send:
+            result = import_products(rows, batch_size=2)
+        self.assertEqual((result.imported, result.failed), (5, 0))
+        announced = [
+            pk for call in send.call_args_list for pk in call.kwargs["product_ids"]
+        ]
+        bulk = Product.objects.filter(name__startswith="Bulk")
+        self.assertCountEqual(announced, bulk.values_list("id", flat=True))
+
+        with tempfile.NamedTemporaryFile(suffix=".csv") as upload:
+            upload.write(b"name,description,price,quantity\nBulk 0,New,3.00,31\n")
+            upload.flush()
+            stdout = StringIO()
+            call_command("import_products", upload.name, stdout=stdout)
+        self.assertIn("Imported 1 products", stdout.getvalue())
+        self.assertEqual(Product.objects.get(name="Bulk 0").description, "New")
+
+    def bulk_update(self, changes, user=None):
+        view = ProductViewSet.as_view({"post": "bulk_update"})
+        request = self.factory.post(
+            reverse("product-bulk-update"), {"changes": changes}, format="json"
+        )
+        force_authenticate(request, user=user or self.employee)
+        return view(request)
+
+    @mock.patch("products.alerts.send_low_stock_alert.apply_async")
+    def test_bulk_update_applies_deltas_and_prices(self, alert):
+        skus = [f"SKU-{number}" for number in range(20)]
+        Product.objects.bulk_create(
+            Product(name=sku, sku=sku, description="x", price=10, quantity=20)
+            for sku in skus
+        )
+        changes = [{"sku": sku, "quantity_delta": 5} for sku in skus]
+        changes += [
+            {"id": self.product.pk, "quantity_delta": -4, "price": "80.00"},
+            {"sku": "SKU-0", "quantity_delta": -20},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.bulk_update(changes)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated"], 21)
+        self.assertLessEqual(len(queries), 10)
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity, self.product.price), (6, 80))
+        self.assertEqual(Product.objects.get(sku="SKU-0").quantity, 5)
+        self.assertEqual(Product.objects.get(sku="SKU-1").quantity, 25)
+        alert.assert_called_once()
+
+    def test_bulk_update_is_all_or_nothing(self):
+        Product.objects.create(
+            name="Other", sku="OTHER", description="x", price=5, quantity=20
+        )
+        response = self.bulk_update(
+            [
+                {"sku": "OTHER", "quantity_delta": 5},
+                {"id": self.product.pk, "quantity_delta": -11},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["products"], [self.product.pk])
+        self.assertEqual(Product.objects.get(sku="OTHER").quantity, 20)
+
+        response = self.bulk_update([{"sku": "MISSING", "quantity_delta": 1}])
+        self.assertEqual(response.data["products"], ["MISSING"])
+        response = self.bulk_update([{"sku": "OTHER", "quantity_delta": 10**12}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.bulk_update(
+            [
+                {"sku": "OTHER", "quantity_delta": MAX_QUANTITY},
+                {"sku": "OTHER", "quantity_delta": 1},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other = Product.objects.get(sku="OTHER")
+        self.assertEqual(response.data["products"], [other.pk])
+        response = self.bulk_update([{"id": self.product.pk, "sku": "OTHER"}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.bulk_update(
+            [{"sku": "OTHER", "quantity_delta": 1}], user=self.customer
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(LOW_STOCK_ALERT_DEBOUNCE=60)
+    @mock.patch("products.alerts.send_low_stock_alert.apply_async")
+    def test_low_stock_crossings_share_one_alert(self, alert):
+        other = Product.objects.create(
+            name="Other", description="x", price=5, quantity=50, low_stock_threshold=40
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.quantity = 3
+            self.product.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            # Still low, so this is not a new crossing.
+            self.product.quantity = 2
+            self.product.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=other.pk).update(quantity=30)
+            products_changed.send(
+                sender=Product, product_ids=[other.pk], fields={"quantity"}
+            )
+        alert.assert_called_once_with(countdown=60)
+        self.assertEqual(LowStockCrossing.objects.count(), 2)
+
+        send_low_stock_alert()
+        send_low_stock_alert()
+        dispatch_outbound_emails()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("Product: 2 (threshold 10)", mail.outbox[0].body)
+        self.assertIn("Other: 30 (threshold 40)", mail.outbox[0].body)
+
+        # The sweep only repeats crossings that were never alerted.
+        check_low_quantity_products()
+        dispatch_outbound_emails()
+        self.assertEqual(len(mail.outbox), 1)
+
+        # Recovering re-arms the product, so the next fall alerts again.
+        self.product.quantity = 20
+        self.product.save()
+        self.assertFalse(LowStockCrossing.objects.filter(product=self.product).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.quantity = 1
+            self.product.save()
+        self.assertEqual(alert.call_count, 2)
+
+        # A lost alert is picked up by the sweep once the debounce window has passed.
+        check_low_quantity_products()
+        dispatch_outbound_emails()
+        self.assertEqual(len(mail.outbox), 1)
+        LowStockCrossing.objects.update(crossed_at=timezone.now() - timedelta(minutes=5))
+        check_low_quantity_products()
+        dispatch_outbound_emails()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("Product: 1 (threshold 10)", mail.outbox[1].body)
+        self.assertNotIn("Other", mail.outbox[1].body)
+
+    @override_settings(STORAGES=IN_MEMORY_STORAGES)
+    @mock.patch("products.reports.CHANGE_FEED_LAG", timedelta(0))
+    def test_daily_product_update_streams_csv(self):
+        other = Product.objects.create(
+            name="Other", sku="OTHER", description="x", price=5, quantity=20
+        )
+        send_daily_product_update()
+        dispatch_outbound_emails()
+        rows = list(csv.reader(StringIO(mail.outbox[0].attachments[0][1])))
+        self.assertEqual(rows[0][:4], ["id", "sku", "name", "quantity"])
+        self.assertEqual([row[2] for row in rows[1:]], ["Product", "Other"])
+        self.assertEqual(mail.outbox[0].to, ["employee@gmail.com"])
+
+        Product.objects.filter(pk=other.pk).update(
+            quantity=25, updated_at=timezone.now()
+        )
+        send_daily_product_update(changed_only=True)
+        dispatch_outbound_emails()
+        self.assertIn("1 products changed", mail.outbox[1].body)
+        rows = list(csv.reader(StringIO(mail.outbox[1].attachments[0][1])))
+        self.assertEqual(rows[1][2:4], ["Other", "25"])
+
+        report = InventoryReport.objects.latest()
+        self.assertEqual((report.changed_only, report.product_count), (True, 1))
+
+    @override_settings(STORAGES=IN_MEMORY_STORAGES, REPORT_RETENTION_DAYS=30)
+    def test_prune_inventory_reports(self):
+        prune_inventory_reports()
+        storage = storages["reports"]
+        name = storage.save("inventory/inventory.csv", ContentFile(b"id\n"))
+        prune_inventory_reports()
+        self.assertTrue(storage.exists(name))
+        later = timezone.now() + timedelta(days=31)
+        with mock.patch("products.tasks.timezone.now", return_value=later):
+            prune_inventory_reports()
+        self.assertFalse(storage.exists(name))
@@ -1,20 +1,64 @@
 import random
 from django.core.exceptions import ValidationError
 from rest_framework import viewsets
+from rest_framework.generics import get_object_or_404
+from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from .models import Product
-from .serializers import ProductSerializer
+from .serializers import (
+    ProductBulkUpdateResultSerializer,
+    ProductBulkUpdateSerializer,
+    ProductChangesSerializer,
+    ProductImportResultSerializer,
+    ProductLookupSerializer,
+    ProductNameSerializer,
+    ProductSerializer,
+    sparse_fields,
+)
 from .permissions import IsEmployeeOrReadOnly
-from accounts.renderers import ErrorRenderer
-from drf_spectacular.utils import extend_schema, OpenApiExample
+from accounts.parsers import MessagePackParser
+from accounts.renderers import ErrorRenderer, MessagePackRenderer
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 from faker import Faker
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework import status
 import faker_commerce
-from .pagination import ProductPagination
+from .filters import ProductFilterBackend, ProductOrderingFilter
+from .pagination import ProductPagination, ProductCursorPagination
+from .cache import cached_catalog_response, get_catalog_version
+from .search import search_products
+from .autocomplete import autocomplete
+from .lookup import MAX_LOOKUP_CODES, lookup_products
+from .inventory import StockChangeError, apply_stock_changes
+from .importers import FORMATS as IMPORT_FORMATS
+from .importers import guess_format, import_products, read_rows
+from .changes import (
+    DELETE,
+    CursorError,
+    CursorExpired,
+    decode_cursor,
+    encode_cursor,
+    read_changes,
+)
+from accounts.conditional import conditional_get, make_etag
 
 fake = Faker()
 fake.add_provider(faker_commerce.Provider)
 
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+CHANGES_MAX_LIMIT = 500
+
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        "fields", str, description="Comma separated product fields to return."
+    ),
+    OpenApiParameter(
+        "exclude", str, description="Comma separated product fields to leave out."
+    ),
+]
+
 
 @extend_schema(
     request=ProductSerializer,
@@ -33,12 +77,313 @@ fake.add_provider(faker_commerce.Provider)
     ],
 )
 class ProductViewSet(viewsets.ModelViewSet):
-    renderer_classes = [ErrorRenderer]
+    renderer_classes = [ErrorRenderer, MessagePackRenderer]
+    parser_classes = [JSONParser, FormParser, MultiPartParser, MessagePackParser]
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsEmployeeOrReadOnly]
 
     pagination_class = ProductPagination
+    filter_backends = [ProductFilterBackend, ProductOrderingFilter]
+    # Every ordering is served by an index: (price, quantity), quantity, name and
+    # (updated_at, id).
+    ordering_fields = ["price", "quantity", "name", "updated_at", "id"]
+
+    @property
+    def paginator(self):
+        """
+        Page number pagination by default, keyset pagination with ?pagination=cursor.
+        """
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params if self.request else {}
+            if params.get("pagination") == "cursor" or "cursor" in params:
+                self._paginator = ProductCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_sparse_fields(self):
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+        return sparse_fields(self.request)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            # Ordering columns stay loaded so pagination never fetches deferred fields.
+            ordering = (
+                ProductOrderingFilter().get_ordering(self.request, queryset, self)
+                or Product._meta.ordering
+            )
+            queryset = queryset.only(*fields, *[f.lstrip("-") for f in ordering])
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault("fields", fields)
+        return super().get_serializer(*args, **kwargs)
+
+    @extend_schema(parameters=SPARSE_FIELDS_PARAMETERS)
+    def list(self, request, *args, **kwargs):
+        etag = make_etag(
+            "products",
+            get_catalog_version(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        return conditional_get(
+            request,
+            lambda: Response(
+                cached_catalog_response(
+                    request,
+                    lambda: super(ProductViewSet, self).list(request, *args, **kwargs).data,
+                )
+            ),
+            etag=etag,
+        )
+
+    @extend_schema(parameters=SPARSE_FIELDS_PARAMETERS)
+    def retrieve(self, request, *args, **kwargs):
+        # Validators come from one indexed lookup, so a matching request is answered
+        # before the payload is serialized or cached.
+        updated_at = get_object_or_404(
+            Product.objects.values_list("updated_at", flat=True), pk=kwargs["pk"]
+        )
+        etag = make_etag(
+            "product",
+            updated_at,
+            get_catalog_version(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        return conditional_get(
+            request,
+            lambda: Response(
+                cached_catalog_response(
+                    request,
+                    lambda: super(ProductViewSet, self)
+                    .retrieve(request, *args, **kwargs)
+                    .data,
+                )
+            ),
+            etag=etag,
+            last_modified=updated_at,
+        )
+
+    @extend_schema(
+        description="Full-text search over product names and descriptions, best matches first",
+        parameters=[
+            OpenApiParameter("q", str, required=True, description="Search text."),
+            *SPARSE_FIELDS_PARAMETERS,
+        ],
+        responses=ProductSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response(
+                {"error": "Missing search query"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        etag = make_etag(
+            "products:search",
+            get_catalog_version(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        )
+        return conditional_get(
+            request,
+            lambda: Response(
+                cached_catalog_response(request, lambda: self.search_page(query))
+            ),
+            etag=etag,
+        )
+
+    def search_page(self, query):
+        paginator = ProductPagination()
+        results = search_products(self.get_queryset(), query)
+        page = paginator.paginate_queryset(results, self.request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data).data
+
+    @extend_schema(
+        description="Products whose name starts with the given text, for typeahead",
+        parameters=[
+            OpenApiParameter("q", str, required=True, description="Name prefix."),
+            OpenApiParameter(
+                "limit", int, description=f"At most {AUTOCOMPLETE_MAX_LIMIT}."
+            ),
+        ],
+        responses=ProductNameSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        prefix = request.query_params.get("q", "").strip()
+        try:
+            limit = int(request.query_params.get("limit", AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            return Response(
+                {"error": "Invalid limit"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not prefix:
+            return Response([])
+        limit = max(1, min(limit, AUTOCOMPLETE_MAX_LIMIT))
+        return Response(autocomplete(prefix, limit))
+
+    @extend_schema(
+        description=(
+            "Resolve up to 500 comma separated SKUs and product ids in one call. "
+            "Unknown codes map to null."
+        ),
+        parameters=[
+            OpenApiParameter("skus", str, description="Comma separated SKUs."),
+            OpenApiParameter("ids", str, description="Comma separated product ids."),
+        ],
+        responses=ProductLookupSerializer,
+    )
+    @action(detail=False, methods=["get"])
+    def lookup(self, request):
+        skus = [c for c in request.query_params.get("skus", "").split(",") if c]
+        try:
+            ids = [
+                int(c) for c in request.query_params.get("ids", "").split(",") if c
+            ]
+        except ValueError:
+            return Response(
+                {"error": "Product ids must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not skus and not ids:
+            return Response(
+                {"error": "Pass skus or ids to look up"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(skus) + len(ids) > MAX_LOOKUP_CODES:
+            return Response(
+                {"error": f"At most {MAX_LOOKUP_CODES} codes can be looked up at once"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        found = lookup_products(skus, ids)
+        return Response(
+            {
+                "skus": {sku: found["sku", sku] for sku in skus},
+                "ids": {str(pk): found["id", pk] for pk in ids},
+            }
+        )
+
+    @extend_schema(
+        description=(
+            "Products created, updated or deleted since a cursor, oldest first. Start "
+            "without a cursor to read the whole catalog, then poll with the returned one."
+        ),
+        parameters=[
+            OpenApiParameter("cursor", str, description="Cursor of the previous poll."),
+            OpenApiParameter(
+                "limit", int, description=f"At most {CHANGES_MAX_LIMIT} changes."
+            ),
+            *SPARSE_FIELDS_PARAMETERS,
+        ],
+        responses=ProductChangesSerializer,
+    )
+    @action(detail=False, methods=["get"])
+    def changes(self, request):
+        try:
+            limit = int(request.query_params.get("limit", CHANGES_MAX_LIMIT))
+        except ValueError:
+            return Response(
+                {"error": "Invalid limit"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        encoded = request.query_params.get("cursor")
+        try:
+            position = decode_cursor(encoded) if encoded else None
+        except CursorExpired as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_410_GONE)
+        except CursorError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, CHANGES_MAX_LIMIT))
+
+        products = Product.objects.all()
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            products = products.only(*fields, "updated_at")
+        changes, position, has_more = read_changes(products, position, limit)
+
+        results = []
+        for changed_at, kind, pk, product in changes:
+            if kind == DELETE:
+                results.append({"op": "delete", "id": pk})
+            else:
+                data = self.get_serializer(product).data
+                results.append({"op": "upsert", "id": pk, "product": data})
+        return Response(
+            {
+                "results": results,
+                "cursor": encode_cursor(position) if position else None,
+                "has_more": has_more,
+            }
+        )
+
+    @extend_schema(
+        description=(
+            "Create or update products by name from an uploaded CSV (with a header) "
+            "or JSON Lines file. Requires employee authentication."
+        ),
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string", "format": "binary"},
+                    "format": {"type": "string", "enum": [*IMPORT_FORMATS]},
+                },
+                "required": ["file"],
+            }
+        },
+        responses=ProductImportResultSerializer,
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        parser_classes=[MultiPartParser],
+    )
+    def import_products(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "Upload a file to import"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        file_format = request.data.get("format") or guess_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            return Response(
+                {"error": "Format must be csv or jsonl"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        result = import_products(read_rows(upload, file_format))
+        return Response(result.as_dict())
+
+    @extend_schema(
+        description=(
+            "Apply stock deltas and new prices to many products, named by id or sku, "
+            "in one transaction. Requires employee authentication."
+        ),
+        request=ProductBulkUpdateSerializer,
+        responses=ProductBulkUpdateResultSerializer,
+    )
+    @action(detail=False, methods=["post"], url_path="bulk-update")
+    def bulk_update(self, request):
+        serializer = ProductBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            product_ids = apply_stock_changes(serializer.validated_data["changes"])
+        except StockChangeError as exc:
+            return Response(
+                {"error": str(exc), "products": exc.products},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({"updated": len(product_ids)})
 
     def create(self, request, *args, **kwargs):
         product_name = request.data.get('name')